@@ -0,0 +1,66 @@
+"""
+比較 TokenAuthentication 與 CachedTokenAuthentication 的每次請求認證成本
+
+    uv run python benchmarks/auth_overhead.py [--requests 5000]
+
+在暫時的測試資料庫中建立使用者與 token，不會動到 db.sqlite3
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from school.authentication import CachedTokenAuthentication, token_cache
+
+
+def measure(authentication, request, count):
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for _ in range(count):
+            authentication.authenticate(request)
+        elapsed = time.perf_counter() - start
+    return elapsed / count * 1e6, len(queries.captured_queries) / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user(username='bench', password='bench')
+        token = Token.objects.create(user=user)
+        request = Request(APIRequestFactory().get('/api/teachers', HTTP_AUTHORIZATION=f'Token {token.key}'))
+
+        token_cache.clear()
+        rows = [
+            ('TokenAuthentication', *measure(TokenAuthentication(), request, args.requests)),
+            ('CachedTokenAuthentication', *measure(CachedTokenAuthentication(), request, args.requests)),
+        ]
+        print(f'{"authentication":<28}{"us/request":>12}{"queries/request":>18}')
+        for name, micros, queries in rows:
+            print(f'{name:<28}{micros:>12.1f}{queries:>18.2f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+量測各 settings profile 的冷啟動時間
+
+    uv run python benchmarks/startup.py [--runs 11]
+
+每次都在新的 Python 行程中量測：
+- import：匯入 mysite.wsgi（django.setup() 與中介層載入）
+- first response：從行程啟動到第一個 /api/ 回應完成
+- request：第一個回應之後，同一個請求再跑一次的時間（中介層堆疊成本）
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PROFILES = ['mysite.settings', 'mysite.settings_api']
+
+PROBE = """
+import io, json, os, sys, time
+start = time.perf_counter()
+os.environ['DJANGO_SETTINGS_MODULE'] = sys.argv[1]
+if sys.argv[2] == '1':
+    os.environ['DJANGO_WARMUP'] = '1'
+from mysite.wsgi import application
+imported = time.perf_counter()
+
+def get(path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+    }
+    statuses = []
+    body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+    assert statuses[0].startswith('200'), (statuses, body[:200])
+
+from django.conf import settings
+settings.ALLOWED_HOSTS = ['localhost']
+get('/api/')
+first = time.perf_counter()
+get('/api/')
+second = time.perf_counter()
+print(json.dumps({'import': imported - start, 'first_response': first - start, 'request': second - first}))
+"""
+
+def run(profile, warmup):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, profile, '1' if warmup else '0'],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=11)
+    args = parser.parse_args()
+
+    print(f'{"profile":<22}{"warm-up":>9}{"import ms":>12}{"first resp ms":>15}{"request ms":>12}')
+    for profile in PROFILES:
+        for warmup in (False, True):
+            samples = [run(profile, warmup) for _ in range(args.runs)]
+            median = {key: statistics.median(sample[key] for sample in samples) * 1000 for key in samples[0]}
+            print(
+                f'{profile:<22}{"yes" if warmup else "no":>9}'
+                f'{median["import"]:>12.1f}{median["first_response"]:>15.1f}{median["request"]:>12.2f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+gunicorn settings for API worker pods.
+
+    uv run gunicorn -c gunicorn.conf.py
+
+Use with the API-only profile (``DJANGO_SETTINGS_MODULE=mysite.settings_api``).
+``preload_app`` imports the project and runs ``mysite.warmup.warm_up`` once in
+the master. Workers are then forked with the URLconf, views and serializers
+already imported.
+
+These workers serve WSGI, so ``/api/stream`` answers 501 here. Serve the event
+stream from a separate ASGI deployment, e.g.
+``uvicorn mysite.asgi:application``, and route ``/api/stream`` to it. Writes
+made here reach it through the ``stream_event`` outbox table, so both
+deployments must use the same database.
+"""
+
+import os
+
+wsgi_app = 'mysite.wsgi:application'
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+raw_env = [
+    'DJANGO_SETTINGS_MODULE=' + os.environ.get('DJANGO_SETTINGS_MODULE', 'mysite.settings_api'),
+    'DJANGO_WARMUP=1',
+]
+
+
+def on_starting(server):
+    # Refuse to start several workers on a per-process cache (school.E001):
+    # throttling and token revocation need a shared cache such as REDIS_URL.
+    from django.core.management import call_command
+
+    os.environ['WEB_CONCURRENCY'] = str(server.num_workers)
+    call_command('check')
+
+
+def post_fork(server, worker):
+    # Make sure no database connection opened in the master is inherited.
+    from django.db import connections
+
+    connections.close_all()
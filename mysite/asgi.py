@@ -3,6 +3,11 @@ ASGI config for mysite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The Server-Sent Events endpoint (``/api/stream``) must be served through this
+ASGI application, e.g. ``uvicorn mysite.asgi:application``. Each process polls
+the ``stream_event`` outbox, so clients see writes made by any worker or by a
+separate WSGI deployment on the same database.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +19,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_asgi_application()
+
+if os.environ.get('DJANGO_WARMUP') == '1':
+    from mysite.warmup import warm_up
+
+    warm_up()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,11 +39,13 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'rest_framework.authtoken',
     'school',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'school.middleware.SlowQueryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -118,6 +121,120 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Throttle counters, token revocation markers and coalesced teacher lists live
+# in the default cache, which every worker must share: Redis when REDIS_URL is
+# set, otherwise a per-process LocMemCache (development and tests), in which case
+# WEB_CONCURRENCY > 1 is rejected by the school.E001 check.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    } if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # 慢查詢紀錄放在檔案快取，各 worker 與 manage.py slow_queries 共用
+    'slow_queries': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'slow_queries',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+
+# Django REST framework
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'school.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'school.throttling.TokenBucketThrottle',
+    ],
+}
+
+# In-process token -> user cache used by CachedTokenAuthentication
+
+SCHOOL_TOKEN_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 300,
+}
+
+# Teacher summaries rendered inside StudentSerializer: per-process LRU
+# (MAXSIZE entries, TTL seconds) in front of the shared cache (TIMEOUT seconds)
+
+SCHOOL_TEACHER_SUMMARY_CACHE = {
+    'MAXSIZE': 2048,
+    'TTL': 60,
+    'TIMEOUT': 3600,
+}
+
+# Token bucket rates per '<basename>.<action>', e.g. '60/min'
+
+SCHOOL_THROTTLE_RATES = {
+    'teacher.list': '60/min',
+    'teacher.retrieve': '120/min',
+    'student.list': '60/min',
+    'search.list': '300/min',
+    'graph.list': '30/min',
+}
+
+
+# Background jobs (/api/jobs)
+# List POSTs larger than ASYNC_THRESHOLD rows are queued and answered with 202.
+# Keep WORKERS at 1 on SQLite, which allows a single writer at a time.
+# Running jobs refresh a heartbeat once per batch; `manage.py run_jobs` requeues
+# those silent for STALE_AFTER seconds, so keep it well above one batch's runtime.
+
+SCHOOL_JOBS = {
+    'WORKERS': 1,
+    'BATCH_SIZE': 500,
+    'ASYNC_THRESHOLD': 1000,
+    'STALE_AFTER': 300,
+}
+
+
+# Graduate archival (manage.py archive_graduates)
+
+SCHOOL_ARCHIVE = {
+    'AFTER_GRADE': 4,
+    'BATCH_SIZE': 500,
+    # Max archived rows appended per /api/students?include_archived=1 response.
+    'PAGE_SIZE': 100,
+}
+
+
+# Slow-query log (school.middleware.SlowQueryMiddleware, manage.py slow_queries)
+
+SCHOOL_SLOW_QUERY_LOG = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'EXPLAIN': True,
+    'SIZE': 500,
+    'CACHE': 'slow_queries',
+}
+
+
+# Composite requests (/api/batch)
+
+SCHOOL_BATCH_MAX_REQUESTS = 50
+
+
+# Server-Sent Events (/api/stream)
+# Per-subscriber queue bound and keepalive interval (seconds). Writes go to the
+# stream_event outbox, which every streaming process polls every POLL_INTERVAL
+# seconds; rows older than RETENTION seconds are pruned.
+
+SCHOOL_EVENT_QUEUE_SIZE = 100
+
+SCHOOL_EVENT_HEARTBEAT = 15
+
+SCHOOL_EVENT_POLL_INTERVAL = 0.5
+
+SCHOOL_EVENT_RETENTION = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,31 @@
+"""
+Worker warm-up for mysite.
+
+Django loads the URLconf and DRF's renderer/parser classes on the first
+request, and school.urls imports each viewset on the first request to its
+routes. ``warm_up()`` does that work up front, so the first request a new
+worker serves is not slower than the rest. It is called from wsgi.py and
+asgi.py when ``DJANGO_WARMUP=1`` is set. With gunicorn's ``preload_app`` the
+work happens once in the master before forking (see gunicorn.conf.py).
+
+No database connection is opened here, so nothing is shared across forks.
+"""
+
+from django.urls import get_resolver
+from rest_framework.settings import api_settings
+
+
+def warm_up():
+    resolver = get_resolver()
+    # reverse() builds the lookup tables; the views themselves are imported lazily.
+    resolver.url_patterns
+    resolver.reverse_dict
+    for name in (
+        'DEFAULT_RENDERER_CLASSES',
+        'DEFAULT_PARSER_CLASSES',
+        'DEFAULT_AUTHENTICATION_CLASSES',
+        'DEFAULT_THROTTLE_CLASSES',
+        'DEFAULT_CONTENT_NEGOTIATION_CLASS',
+    ):
+        getattr(api_settings, name)
+    import school.views  # noqa: F401
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Teacher, Student
+from .models import Teacher, Student, ArchivedStudent
 # Register your models here.
 admin.site.register(Teacher)
-admin.site.register(Student)
\ No newline at end of file
+admin.site.register(Student)
+admin.site.register(ArchivedStudent)
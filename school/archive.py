@@ -0,0 +1,66 @@
+# school/archive.py
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ArchivedStudent, Student, current_school_year
+from .serializers import TeacherSimpleSerializer
+
+
+def archive_option(name, default):
+    return getattr(settings, 'SCHOOL_ARCHIVE', {}).get(name, default)
+
+
+def graduated_before(after_grade):
+    """年級超過 after_grade 的學生其 enroll_year 小於此值"""
+    return current_school_year() - after_grade + 1
+
+
+def graduates(after_grade):
+    return Student.objects.filter(enroll_year__lt=graduated_before(after_grade))
+
+
+def _snapshot(teacher):
+    return TeacherSimpleSerializer(teacher).data if teacher is not None else None
+
+
+def _archived_copy(student):
+    return ArchivedStudent(
+        student_pk=student.pk,
+        student_name=student.student_name,
+        student_id=student.student_id,
+        role=student.role,
+        department_id=student.department_id,
+        enroll_year=student.enroll_year,
+        class_id=student.class_id,
+        mentor_id=student.mentor_id,
+        advisor_id=student.advisor_id,
+        mentor_snapshot=_snapshot(student.mentor),
+        advisor_snapshot=_snapshot(student.advisor),
+        version=student.version,
+        created_at=student.created_at,
+    )
+
+
+def archive_graduates(after_grade=None, batch_size=None):
+    """
+    把年級超過 after_grade 的學生分批搬到 student_archive
+    每批一個交易：先寫入封存表再從 student_list 刪除，中斷後重新執行會從剩下的學生繼續
+    回傳搬移的筆數
+    """
+    if after_grade is None:
+        after_grade = archive_option('AFTER_GRADE', 4)
+    if batch_size is None:
+        batch_size = archive_option('BATCH_SIZE', 500)
+
+    moved = 0
+    while True:
+        with transaction.atomic():
+            students = list(
+                graduates(after_grade).select_related('mentor', 'advisor').order_by('pk')[:batch_size]
+            )
+            if not students:
+                return moved
+            ArchivedStudent.objects.bulk_create([_archived_copy(student) for student in students])
+            Student.objects.filter(pk__in=[student.pk for student in students]).delete()
+        moved += len(students)
@@ -0,0 +1,62 @@
+# school/authentication.py
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import LRUCache
+
+_options = getattr(settings, 'SCHOOL_TOKEN_CACHE', {})
+token_cache = LRUCache(maxsize=_options.get('MAXSIZE', 10000), ttl=_options.get('TTL', 300))
+
+
+def _changed_key(user_id):
+    return f'school:auth:changed:{user_id}'
+
+
+def _snapshot(instance):
+    return instance._state.db, [getattr(instance, field.attname) for field in instance._meta.concrete_fields]
+
+
+def _restore(model, snapshot):
+    db, values = snapshot
+    return model.from_db(db, [field.attname for field in model._meta.concrete_fields], values)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token 認證，token -> user 的結果快取在行程內的 LRU/TTL cache
+    快取只保存欄位值，每個請求都重建新的 User/Token，權限快取等實例狀態不會跨請求共用
+    命中時會查共用 Django cache 中該使用者的異動時間，其他 worker 撤銷 token 或修改使用者後立即失效
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            filled_at, user_id, user_snapshot, token_snapshot = cached
+            changed_at = cache.get(_changed_key(user_id))
+            if changed_at is None or changed_at < filled_at:
+                token = _restore(self.get_model(), token_snapshot)
+                user = _restore(type(token).user.field.related_model, user_snapshot)
+                type(token).user.field.set_cached_value(token, user)
+                return user, token
+            token_cache.delete(key)
+
+        # 先記下時間再查資料庫，查詢期間發生的異動也會讓這筆快取失效
+        filled_at = time.time()
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (filled_at, user.pk, _snapshot(user), _snapshot(token)))
+        return user, token
+
+
+def forget_user(user_id):
+    """使用者或其 token 異動：清除本行程的快取，並通知其他 worker"""
+    cache.set(_changed_key(user_id), time.time(), timeout=token_cache.ttl)
+    token_cache.delete_where(lambda key, value: value[1] == user_id)
+
+
+def forget_token(key, user_id):
+    token_cache.delete(key)
+    forget_user(user_id)
@@ -0,0 +1,112 @@
+# school/batch.py
+
+import io
+import json
+import logging
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+
+from .identity import IdentityMap, current_identity_map
+from .slowlog import current_subrequest
+
+logger = logging.getLogger(__name__)
+
+# 子請求不能再呼叫 batch 本身，也不能開啟串流
+BLOCKED_URL_NAMES = {'batch-list', 'event-stream'}
+
+# 回傳給客戶端的子回應 header
+FORWARDED_HEADERS = ('ETag', 'Location', 'Retry-After')
+
+# 子請求可以自行指定的 header
+ALLOWED_HEADERS = {'if-match'}
+
+# 不沿用到子請求的外層 header
+DROPPED_META = {
+    'CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_ACCEPT_ENCODING', 'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH',
+    'HTTP_ACCEPT', 'QUERY_STRING', 'PATH_INFO', 'REQUEST_METHOD',
+}
+
+
+def _build_request(request, method, path, query, body, headers):
+    content = b'' if body is None else json.dumps(body).encode()
+    environ = {key: value for key, value in request.META.items() if isinstance(value, str) and key not in DROPPED_META}
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': query,
+        'HTTP_ACCEPT': 'application/json',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'wsgi.input': io.BytesIO(content),
+        'wsgi.url_scheme': request.scheme,
+    })
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    sub_request = WSGIRequest(environ)
+    # 共用外層已認證的使用者，子請求不再重新認證（DRF Request 會使用這兩個屬性）
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    sub_request.user = request.user
+    return sub_request
+
+
+def _error(code, detail):
+    return {'status': code, 'headers': {}, 'body': {'detail': detail}}
+
+
+def run_subrequest(request, spec):
+    path, _, query = spec['path'].partition('?')
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _error(status.HTTP_404_NOT_FOUND, 'Not found.')
+    if match.url_name in BLOCKED_URL_NAMES:
+        return _error(status.HTTP_400_BAD_REQUEST, 'This endpoint cannot be used inside a batch.')
+
+    sub_request = _build_request(request, spec['method'], path, query, spec.get('body'), spec.get('headers'))
+    sub_request.resolver_match = match
+    token = current_subrequest.set(sub_request)
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception('Batch sub-request %s %s failed', spec['method'], spec['path'])
+        return _error(status.HTTP_500_INTERNAL_SERVER_ERROR, 'Server error.')
+    finally:
+        current_subrequest.reset(token)
+
+    if hasattr(response, 'data'):
+        # DRF 回應直接取 data，不需要先 render 成 JSON 再解析
+        body = response.data
+    elif response.content:
+        try:
+            body = json.loads(response.content)
+        except ValueError:
+            body = response.content.decode(response.charset or 'utf-8', errors='replace')
+    else:
+        body = None
+    headers = {name: response[name] for name in FORWARDED_HEADERS if response.has_header(name)}
+    return {'status': response.status_code, 'headers': headers, 'body': body}
+
+
+def run_batch(request, specs):
+    """
+    依序執行子請求，共用外層請求的使用者與同一個 identity map
+    子請求之間彼此獨立，不包在同一個交易中
+    """
+    identity_map = IdentityMap()
+    token = current_identity_map.set(identity_map)
+    try:
+        results = []
+        for spec in specs:
+            results.append(run_subrequest(request, spec))
+            if spec['method'] not in SAFE_METHODS:
+                # 寫入可能改變其他已載入物件的關聯（例如老師的 mentees），整個 map 清空重新載入
+                identity_map.clear()
+        return results
+    finally:
+        current_identity_map.reset(token)
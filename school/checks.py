@@ -0,0 +1,26 @@
+# school/checks.py
+
+import os
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# 只存在於單一行程內的 cache backend
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """多個 worker 時，限流與 token 撤銷所用的 default cache 必須是共用的"""
+    workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if workers > 1 and backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f'The default cache ({backend}) is per process, but WEB_CONCURRENCY={workers}.',
+            hint='Throttle buckets and token revocations would not be shared between workers; set REDIS_URL or point CACHES["default"] at a shared backend.',
+            id='school.E001',
+        )]
+    return []
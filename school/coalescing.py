@@ -0,0 +1,120 @@
+# school/coalescing.py
+
+import hashlib
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    合併同時進行的相同請求：同一個 key 同時只會執行一次 fn，
+    其他等待中的執行緒直接共用結果（或例外）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class SharedFlight(SingleFlight):
+    """
+    先在行程內合併執行緒，再透過共用 cache 合併不同 worker/pod 的相同請求
+    leader 以 cache.add 取得 lock（值為這次執行的 token），完成後把結果存到該 token 的 key 再釋放 lock
+    其他行程看到 lock 時輪詢該 token 的結果；lock 被釋放卻沒有結果（leader 失敗）就自己競爭 leader，
+    等待超過 timeout 則直接自己執行。結果只給等待中的請求使用，lock 釋放後的新請求會重新執行
+    """
+
+    def __init__(self, prefix, alias='default', timeout=10, poll_interval=0.02):
+        super().__init__()
+        self.prefix = prefix
+        self.alias = alias
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def keys(self, key, token=None):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return f'{self.prefix}:{digest}:lock', f'{self.prefix}:{digest}:{token}'
+
+    def do(self, key, fn):
+        return super().do(key, lambda: self._shared(key, fn))
+
+    def _shared(self, key, fn):
+        cache = self.cache
+        lock_key, _ = self.keys(key)
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            token = uuid.uuid4().hex
+            if cache.add(lock_key, token, self.timeout):
+                return self._lead(key, token, fn)
+            token = cache.get(lock_key)
+            if token is None:
+                continue
+            result = self._follow(key, token, deadline)
+            if result is not _MISSING:
+                return result
+        return fn()
+
+    def _lead(self, key, token, fn):
+        cache = self.cache
+        lock_key, result_key = self.keys(key, token)
+        try:
+            result = fn()
+            cache.set(result_key, result, self.timeout)
+            return result
+        finally:
+            # lock 可能已逾時並被其他 leader 取得，只釋放自己的
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    def _follow(self, key, token, deadline):
+        cache = self.cache
+        lock_key, result_key = self.keys(key, token)
+        while time.monotonic() < deadline:
+            result = cache.get(result_key, _MISSING)
+            if result is not _MISSING:
+                return result
+            if cache.get(lock_key) != token:
+                # leader 已結束：先存結果再釋放 lock，所以再讀一次就知道它是否成功
+                return cache.get(result_key, _MISSING)
+            time.sleep(self.poll_interval)
+        return _MISSING
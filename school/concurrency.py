@@ -0,0 +1,58 @@
+# school/concurrency.py
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import VersionConflict
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has been modified; fetch it again and retry.'
+    default_code = 'precondition_failed'
+
+
+def etag_for(version):
+    return f'"{version}"'
+
+
+def parse_if_match(request):
+    """
+    解析 If-Match header，回傳客戶端持有的 version
+    沒有帶或為 * 時回傳 None（不檢查版本）；無法解析時視為不符合
+    """
+    value = request.headers.get('If-Match', '').strip()
+    if not value or value == '*':
+        return None
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise PreconditionFailed()
+
+
+class OptimisticConcurrencyMixin:
+    """
+    讓 ModelViewSet 支援 If-Match：retrieve/update 回應帶 ETag (version)，
+    更新時以客戶端的 version 做條件式 UPDATE，衝突回傳 412
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag_for(response.data['version'])
+        return response
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response['ETag'] = etag_for(response.data['version'])
+        return response
+
+    def perform_update(self, serializer):
+        expected = parse_if_match(self.request)
+        if expected is not None:
+            serializer.instance.version = expected
+        try:
+            serializer.save()
+        except VersionConflict:
+            raise PreconditionFailed()
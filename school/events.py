@@ -0,0 +1,196 @@
+# school/events.py
+
+import asyncio
+import itertools
+import logging
+import threading
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+# 每次輪詢最多取回的 outbox 列數
+RELAY_BATCH_SIZE = 500
+
+# 每新增這麼多列清除一次超過 SCHOOL_EVENT_RETENTION 的 outbox 列
+PRUNE_EVERY = 1000
+
+
+class Subscription:
+    """
+    單一訂閱者的有界佇列
+    佇列滿時丟棄最舊的事件並累計 dropped，避免慢速客戶端拖住整個 broker
+    """
+
+    def __init__(self, broker, filters, maxsize, loop):
+        self.broker = broker
+        self.filters = filters
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, event):
+        attrs = event['attrs']
+        return all(attrs.get(key) == value for key, value in self.filters.items())
+
+    def offer(self, event):
+        # 只在訂閱者自己的 event loop 中執行
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """取得下一筆事件，逾時回傳 None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def take_dropped(self):
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """
+    行程內的事件分送器
+    publish 可以從任何執行緒呼叫，事件會透過 call_soon_threadsafe 送進各訂閱者的 event loop
+    跨行程的事件由 relay 從 stream_event outbox 輪詢後再 publish，每個 event loop 一個 relay
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._sequence = itertools.count(1)
+        self._relays = {}
+
+    def subscribe(self, filters=None, maxsize=None):
+        if maxsize is None:
+            maxsize = getattr(settings, 'SCHOOL_EVENT_QUEUE_SIZE', 100)
+        subscription = Subscription(self, filters or {}, maxsize, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _has_subscribers(self, loop):
+        with self._lock:
+            return any(subscription.loop is loop for subscription in self._subscribers)
+
+    async def ensure_relay(self):
+        """
+        確保目前的 event loop 有 relay 在輪詢 outbox
+        從呼叫當下最新的一列之後開始，之前的事件不會補送
+        """
+        loop = asyncio.get_running_loop()
+        if loop in self._relays:
+            return
+        after = await sync_to_async(latest_event_id)()
+        if loop not in self._relays:
+            self._relays[loop] = loop.create_task(self._relay(loop, after))
+
+    async def _relay(self, loop, after):
+        interval = getattr(settings, 'SCHOOL_EVENT_POLL_INTERVAL', 0.5)
+        try:
+            # 訂閱者都離開後結束，下一個訂閱者會重新啟動
+            while self._has_subscribers(loop):
+                await asyncio.sleep(interval)
+                try:
+                    events = await sync_to_async(fetch_events)(after, RELAY_BATCH_SIZE)
+                except Exception:
+                    logger.exception('Failed to read stream events after %s', after)
+                    continue
+                for event in events:
+                    after = event['seq']
+                    self.publish(event, loop=loop)
+        finally:
+            self._relays.pop(loop, None)
+
+    def publish(self, event, loop=None):
+        """送給符合條件的訂閱者；指定 loop 時只送給該 event loop 的訂閱者"""
+        if 'seq' not in event:
+            event = dict(event, seq=next(self._sequence))
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if loop is not None and subscription.loop is not loop:
+                continue
+            if not subscription.matches(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # event loop 已關閉，視為斷線
+                self.unsubscribe(subscription)
+        return event
+
+
+broker = EventBroker()
+
+
+def record_event(event):
+    """
+    把事件寫入 outbox，與觸發的寫入在同一個交易中，rollback 時一併取消
+    每 PRUNE_EVERY 列順便清除過期的列，沒有串流服務時 outbox 也不會無限成長
+    """
+    row = StreamEvent.objects.create(
+        type=event['type'],
+        model=event['model'],
+        object_id=event['id'],
+        data=event['data'],
+        attrs=event['attrs'],
+    )
+    if row.pk % PRUNE_EVERY == 0:
+        retention = getattr(settings, 'SCHOOL_EVENT_RETENTION', 3600)
+        StreamEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=retention)).delete()
+    return row
+
+
+def latest_event_id():
+    return StreamEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def fetch_events(after, limit):
+    """依寫入順序取回 id 大於 after 的事件，seq 即 outbox 的 id"""
+    rows = StreamEvent.objects.filter(pk__gt=after).order_by('pk')[:limit]
+    return [
+        {
+            'type': row.type,
+            'model': row.model,
+            'id': row.object_id,
+            'data': row.data,
+            'attrs': row.attrs,
+            'seq': row.pk,
+        }
+        for row in rows
+    ]
+
+
+def build_event(kind, model_name, instance, data):
+    """組出 broker 使用的事件，attrs 只放可供過濾的欄位"""
+    attrs = {'model': model_name, 'department_id': instance.department_id}
+    if hasattr(instance, 'class_id'):
+        attrs['class_id'] = instance.class_id
+    return {
+        'type': kind,
+        'model': model_name,
+        'id': instance.pk,
+        'data': data,
+        'attrs': attrs,
+    }
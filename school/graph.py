@@ -0,0 +1,56 @@
+# school/graph.py
+
+from django.db.models import Q
+
+from .models import Student, Teacher, grade_for
+
+TEACHER_FIELDS = ['id', 'teacher_name', 'staff_id', 'title', 'department_id']
+STUDENT_FIELDS = ['id', 'student_name', 'student_id', 'role', 'department_id', 'enroll_year', 'class_id']
+
+
+def build_graph(teacher_ids=(), student_ids=(), department_id=None):
+    """
+    以固定三次查詢取得導師/指導老師的二分圖
+    1. 起點學生（指定 id 或該系所）
+    2. 起點老師（指定 id、該系所、起點學生的導師與指導老師）名下的所有學生
+    3. 所有出現在圖中的老師
+    回傳正規化的結構：實體以 id 為 key 只出現一次，關係放在 edges
+    """
+    teacher_ids = set(teacher_ids)
+    seed_filter = Q(pk__in=set(student_ids))
+    if department_id:
+        seed_filter |= Q(department_id=department_id)
+    student_fields = STUDENT_FIELDS + ['mentor_id', 'advisor_id']
+
+    students = {row['id']: row for row in Student.objects.filter(seed_filter).values(*student_fields)}
+
+    seed_teacher_ids = set(teacher_ids)
+    for row in students.values():
+        seed_teacher_ids.update(pk for pk in (row['mentor_id'], row['advisor_id']) if pk is not None)
+    related_filter = Q(mentor_id__in=seed_teacher_ids) | Q(advisor_id__in=seed_teacher_ids)
+    if department_id:
+        department_teachers = Teacher.objects.filter(department_id=department_id).values('pk')
+        related_filter |= Q(mentor_id__in=department_teachers) | Q(advisor_id__in=department_teachers)
+    if seed_teacher_ids or department_id:
+        for row in Student.objects.filter(related_filter).values(*student_fields):
+            students.setdefault(row['id'], row)
+
+    all_teacher_ids = set(seed_teacher_ids)
+    for row in students.values():
+        all_teacher_ids.update(pk for pk in (row['mentor_id'], row['advisor_id']) if pk is not None)
+    teacher_filter = Q(pk__in=all_teacher_ids)
+    if department_id:
+        teacher_filter |= Q(department_id=department_id)
+    teachers = {row['id']: row for row in Teacher.objects.filter(teacher_filter).values(*TEACHER_FIELDS)}
+
+    edges = {'mentor': [], 'advisor': []}
+    for row in students.values():
+        mentor_id = row.pop('mentor_id')
+        advisor_id = row.pop('advisor_id')
+        row['grade'] = grade_for(row['enroll_year'])
+        if mentor_id is not None:
+            edges['mentor'].append([row['id'], mentor_id])
+        if advisor_id is not None:
+            edges['advisor'].append([row['id'], advisor_id])
+
+    return {'teachers': teachers, 'students': students, 'edges': edges}
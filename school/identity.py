@@ -0,0 +1,54 @@
+# school/identity.py
+
+from contextvars import ContextVar
+
+from rest_framework.permissions import SAFE_METHODS
+
+current_identity_map = ContextVar('school_identity_map', default=None)
+
+
+class IdentityMap:
+    """請求範圍內的物件快取，同一個 (model, pk) 只從資料庫載入一次"""
+
+    def __init__(self):
+        self._objects = {}
+
+    def get(self, model, pk):
+        return self._objects.get((model, str(pk)))
+
+    def add(self, obj):
+        self._objects[(type(obj), str(obj.pk))] = obj
+
+    def discard(self, model, pk):
+        self._objects.pop((model, str(pk)), None)
+
+    def clear(self):
+        self._objects.clear()
+
+
+def discard_identity(instance):
+    identity_map = current_identity_map.get()
+    if identity_map is not None:
+        identity_map.discard(type(instance), instance.pk)
+
+
+class IdentityMapMixin:
+    """
+    在 identity map 啟用時（/api/batch 的子請求），GET 的 get_object() 先查 map
+    寫入類請求一律重新載入，確保樂觀鎖使用最新的 version
+    """
+
+    def get_object(self):
+        identity_map = current_identity_map.get()
+        if identity_map is None or self.request.method not in SAFE_METHODS:
+            return super().get_object()
+
+        model = self.get_queryset().model
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = identity_map.get(model, self.kwargs[lookup_url_kwarg])
+        if obj is None:
+            obj = super().get_object()
+            identity_map.add(obj)
+        else:
+            self.check_object_permissions(self.request, obj)
+        return obj
@@ -0,0 +1,179 @@
+# school/jobs.py
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job, JobResult, JobStatus, Student, Teacher, VersionConflict
+from .serializers import StudentSerializer, TeacherSerializer
+
+logger = logging.getLogger(__name__)
+
+# kind 前綴 -> (model, serializer, import 時用來比對的唯一欄位)
+TARGETS = {
+    'student': (Student, StudentSerializer, 'student_id'),
+    'teacher': (Teacher, TeacherSerializer, 'staff_id'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class JobLost(Exception):
+    """工作已被判定為逾時並重新排入，目前的 runner 不再擁有它"""
+
+
+def job_option(name, default):
+    return getattr(settings, 'SCHOOL_JOBS', {}).get(name, default)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=job_option('WORKERS', 1), thread_name_prefix='school-job')
+        return _executor
+
+
+def enqueue(kind, rows, user=None):
+    """建立工作並在交易 commit 後交給背景 worker 執行"""
+    job = Job.objects.create(
+        kind=kind,
+        payload=rows,
+        total=len(rows),
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    transaction.on_commit(lambda: get_executor().submit(_run_in_worker, job.pk))
+    return job
+
+
+def _run_in_worker(job_id):
+    try:
+        run_job(job_id)
+    except Exception:
+        logger.exception('Job %s crashed', job_id)
+    finally:
+        # worker 執行緒有自己的資料庫連線，用完即關閉
+        close_old_connections()
+
+
+def _process_row(model, serializer_class, lookup_field, mode, row):
+    if not isinstance(row, dict):
+        return 'error', None, {'non_field_errors': ['Expected an object.']}
+
+    instance = None
+    if mode == 'update':
+        instance = model.objects.filter(pk=row.get('id')).first()
+        if instance is None:
+            return 'error', None, {'id': ['Object does not exist.']}
+    elif mode == 'import' and row.get(lookup_field):
+        instance = model.objects.filter(**{lookup_field: row[lookup_field]}).first()
+    if instance is not None and row.get('version') is not None:
+        # 列中帶 version 時以樂觀鎖更新，版本不符記為 conflict
+        try:
+            instance.version = int(row['version'])
+        except (TypeError, ValueError):
+            return 'error', None, {'version': ['A valid integer is required.']}
+
+    serializer = serializer_class(instance, data=row, partial=instance is not None)
+    if not serializer.is_valid():
+        return 'error', None, serializer.errors
+    try:
+        obj = serializer.save()
+    except VersionConflict as error:
+        # 條件式 UPDATE 沒有更新任何列，不會破壞交易狀態
+        return 'conflict', instance.pk, {'version': [str(error)]}
+    return ('updated' if instance is not None else 'created'), obj.pk, None
+
+
+def _heartbeat(job, owner, **fields):
+    """
+    確認仍擁有工作並更新 heartbeat_at，在批次交易中呼叫
+    工作已被重新排入（owner 不同）時拋出 JobLost，整批 rollback
+    """
+    fields['heartbeat_at'] = timezone.now()
+    if not Job.objects.filter(pk=job.pk, owner=owner, status=JobStatus.RUNNING).update(**fields):
+        raise JobLost(f'Job {job.pk} is no longer owned by {owner}.')
+
+
+def run_job(job_id):
+    """
+    分批處理工作內容，每批一個交易，每列各自一個 savepoint
+    單列失敗只記錄在該列的結果，不影響同批其他列
+    每批開始與結束時更新 heartbeat，超過 SCHOOL_JOBS['STALE_AFTER'] 秒沒有更新才會被 requeue_stale 重新排入
+    """
+    owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    now = timezone.now()
+    claimed = Job.objects.filter(pk=job_id, status=JobStatus.PENDING).update(
+        status=JobStatus.RUNNING, owner=owner, started_at=now, heartbeat_at=now,
+    )
+    if not claimed:
+        return None
+
+    job = Job.objects.get(pk=job_id)
+    target, mode = job.kind.split('.')
+    model, serializer_class, lookup_field = TARGETS[target]
+    batch_size = job_option('BATCH_SIZE', 500)
+    rows = job.payload
+
+    try:
+        # processed 與該批結果在同一個交易中寫入，重新執行時可以從中斷處接續
+        for offset in range(job.processed, len(rows), batch_size):
+            results = []
+            with transaction.atomic():
+                # 先鎖定工作列：其他 runner 無法在這批進行中把工作重新排入
+                _heartbeat(job, owner)
+                for index, row in enumerate(rows[offset:offset + batch_size], start=offset):
+                    try:
+                        with transaction.atomic():
+                            row_status, object_id, errors = _process_row(model, serializer_class, lookup_field, mode, row)
+                    except IntegrityError as error:
+                        row_status, object_id, errors = 'error', None, {'non_field_errors': [str(error)]}
+                    results.append(JobResult(job=job, index=index, status=row_status, object_id=object_id, errors=errors))
+                JobResult.objects.bulk_create(results)
+                job.processed += len(results)
+                job.failed += sum(1 for result in results if result.status not in ('created', 'updated'))
+                job.succeeded = job.processed - job.failed
+                _heartbeat(job, owner, processed=job.processed, succeeded=job.succeeded, failed=job.failed)
+        job.status = JobStatus.SUCCEEDED
+    except JobLost:
+        logger.warning('Job %s was requeued while %s was running it; leaving it to the new runner', job.pk, owner)
+        return None
+    except Exception as error:
+        job.status = JobStatus.FAILED
+        job.error = str(error)
+        raise
+    finally:
+        # 仍是 running 表示工作已交給其他 runner，不覆寫它的狀態
+        if job.status != JobStatus.RUNNING:
+            job.finished_at = timezone.now()
+            Job.objects.filter(pk=job.pk, owner=owner).update(
+                status=job.status, error=job.error, finished_at=job.finished_at,
+            )
+    return job
+
+
+def requeue_stale():
+    """把超過 STALE_AFTER 秒沒有 heartbeat 的 running 工作（runner 已結束）重新排入，回傳筆數"""
+    cutoff = timezone.now() - timedelta(seconds=job_option('STALE_AFTER', 300))
+    return Job.objects.filter(status=JobStatus.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True)
+    ).update(status=JobStatus.PENDING, owner='', heartbeat_at=None)
+
+
+def run_pending():
+    """依建立順序執行所有 pending 工作，已被其他 runner 搶先取得的會略過"""
+    pending = Job.objects.filter(status=JobStatus.PENDING).order_by('created_at').values_list('pk', flat=True)
+    for job_id in list(pending):
+        job = run_job(job_id)
+        if job is not None:
+            yield job
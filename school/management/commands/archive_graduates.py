@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from school.archive import archive_graduates, archive_option, graduated_before, graduates
+
+
+class Command(BaseCommand):
+    help = 'Move students past the graduation grade from student_list into student_archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grade',
+            type=int,
+            default=archive_option('AFTER_GRADE', 4),
+            help='Archive students whose computed grade is above this value (default: SCHOOL_ARCHIVE["AFTER_GRADE"]).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=archive_option('BATCH_SIZE', 500),
+            help='Number of students moved per transaction.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many students would be archived.',
+        )
+
+    def handle(self, *args, **options):
+        grade = options['grade']
+        cutoff = graduated_before(grade)
+        if options['dry_run']:
+            count = graduates(grade).count()
+            self.stdout.write(f'{count} student(s) enrolled before {cutoff} would be archived.')
+            return
+
+        moved = archive_graduates(grade, options['batch_size'])
+        self.stdout.write(f'Archived {moved} student(s) enrolled before {cutoff}.')
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from school.jobs import requeue_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs, e.g. jobs left pending by a restarted worker. '
+        'Running jobs whose heartbeat is older than SCHOOL_JOBS["STALE_AFTER"] are requeued first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll',
+            type=float,
+            metavar='SECONDS',
+            help='Keep running and check for stale and pending jobs every SECONDS.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            requeued = requeue_stale()
+            if requeued:
+                self.stdout.write(f'Requeued {requeued} stale job(s).')
+            for job in run_pending():
+                self.stdout.write(f'Job {job.pk} {job.kind}: {job.succeeded} succeeded, {job.failed} failed.')
+            if not options['poll']:
+                return
+            close_old_connections()
+            time.sleep(options['poll'])
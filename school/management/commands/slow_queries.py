@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from school.slowlog import aggregate, slow_query_log
+
+
+class Command(BaseCommand):
+    help = 'Show slow queries recorded by SlowQueryMiddleware, grouped by normalized query shape.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of query shapes to list, slowest total time first.',
+        )
+        parser.add_argument(
+            '--view',
+            help='Only include queries issued by this view, e.g. StudentViewSet or StudentViewSet.list.',
+        )
+        parser.add_argument(
+            '--show',
+            metavar='FINGERPRINT',
+            help='Print the latest SQL, parameters, origin and EXPLAIN plan recorded for one query shape.',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Empty the slow-query ring buffer.',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            slow_query_log.clear()
+            self.stdout.write('Cleared the slow-query log.')
+            return
+
+        entries = slow_query_log.entries()
+        if options['view']:
+            view, _, action = options['view'].partition('.')
+            entries = [
+                entry for entry in entries
+                if entry['view'] == view and (not action or entry['action'] == action)
+            ]
+        groups = aggregate(entries)
+
+        if options['show']:
+            group = next((group for group in groups if group['fingerprint'] == options['show']), None)
+            if group is None:
+                raise CommandError(f'No slow query with fingerprint {options["show"]}.')
+            self.show(group)
+            return
+
+        if not groups:
+            self.stdout.write('No slow queries recorded.')
+            return
+        self.stdout.write(f'{len(entries)} slow quer(ies) in {len(groups)} shape(s):')
+        for group in groups[:options['limit']]:
+            self.stdout.write(
+                f"{group['fingerprint']}  count={group['count']}  total={group['total_ms']:.1f}ms  "
+                f"avg={group['total_ms'] / group['count']:.1f}ms  max={group['max_ms']:.1f}ms  "
+                f"views={', '.join(sorted(str(view) for view in group['views']))}"
+                + (f"  errors={group['errors']}" if group['errors'] else '')
+            )
+            self.stdout.write(f"    {group['shape'][:200]}")
+
+    def show(self, group):
+        latest = group['latest']
+        self.stdout.write(f"Shape:    {group['shape']}")
+        self.stdout.write(f"Count:    {group['count']} (max {group['max_ms']:.1f}ms)")
+        self.stdout.write(f"Latest:   {latest['duration_ms']:.1f}ms at {latest['at']}")
+        self.stdout.write(f"Origin:   {latest['view']}.{latest['action']}  {latest['method']} {latest['path']}")
+        self.stdout.write(f"SQL:      {latest['sql']}")
+        self.stdout.write(f"Params:   {latest['params']}")
+        if latest.get('error'):
+            self.stdout.write(f"Error:    {latest['error']}")
+        self.stdout.write('Plan:')
+        for line in latest['plan'] or ['(not captured)']:
+            self.stdout.write(f'    {line}')
@@ -0,0 +1,27 @@
+# school/middleware.py
+
+from contextlib import ExitStack
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .slowlog import SlowQueryRecorder, slow_query_option
+
+
+class SlowQueryMiddleware:
+    """
+    在每個請求期間掛上 SlowQueryRecorder，超過 SCHOOL_SLOW_QUERY_LOG['THRESHOLD_MS'] 的查詢
+    連同 view/action 與 EXPLAIN 結果寫入環狀緩衝區，可用 manage.py slow_queries 查看
+    """
+
+    def __init__(self, get_response):
+        if not slow_query_option('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.get_response(request)
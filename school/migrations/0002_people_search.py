@@ -0,0 +1,84 @@
+from django.db import migrations
+
+# 學生 rowid = id * 2，老師 rowid = id * 2 + 1，讓 trigger 可以直接定位索引列
+FORWARD_SQL = [
+    """
+    CREATE VIRTUAL TABLE people_search USING fts5(
+        name, identifier UNINDEXED, kind UNINDEXED, ref_id UNINDEXED,
+        tokenize = 'trigram'
+    )
+    """,
+    """
+    INSERT INTO people_search(rowid, name, identifier, kind, ref_id)
+    SELECT id * 2, student_name, student_id, 'student', id FROM student_list
+    """,
+    """
+    INSERT INTO people_search(rowid, name, identifier, kind, ref_id)
+    SELECT id * 2 + 1, teacher_name, staff_id, 'teacher', id FROM teacher_list
+    """,
+    """
+    CREATE TRIGGER student_search_insert AFTER INSERT ON student_list BEGIN
+        INSERT INTO people_search(rowid, name, identifier, kind, ref_id)
+        VALUES (new.id * 2, new.student_name, new.student_id, 'student', new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER student_search_update AFTER UPDATE OF student_name, student_id ON student_list BEGIN
+        UPDATE people_search SET name = new.student_name, identifier = new.student_id
+        WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER student_search_delete AFTER DELETE ON student_list BEGIN
+        DELETE FROM people_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER teacher_search_insert AFTER INSERT ON teacher_list BEGIN
+        INSERT INTO people_search(rowid, name, identifier, kind, ref_id)
+        VALUES (new.id * 2 + 1, new.teacher_name, new.staff_id, 'teacher', new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER teacher_search_update AFTER UPDATE OF teacher_name, staff_id ON teacher_list BEGIN
+        UPDATE people_search SET name = new.teacher_name, identifier = new.staff_id
+        WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER teacher_search_delete AFTER DELETE ON teacher_list BEGIN
+        DELETE FROM people_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS student_search_insert',
+    'DROP TRIGGER IF EXISTS student_search_update',
+    'DROP TRIGGER IF EXISTS student_search_delete',
+    'DROP TRIGGER IF EXISTS teacher_search_insert',
+    'DROP TRIGGER IF EXISTS teacher_search_update',
+    'DROP TRIGGER IF EXISTS teacher_search_delete',
+    'DROP TABLE IF EXISTS people_search',
+]
+
+
+def _run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        # FTS5 只有 SQLite 有，其他資料庫由 school.search 退回 icontains 查詢
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run_on_sqlite(FORWARD_SQL), _run_on_sqlite(REVERSE_SQL)),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+# SQLite 新增有預設值的欄位時會重建資料表，0002 建立的搜尋 trigger 會跟著消失，需要重新建立
+SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS student_search_insert AFTER INSERT ON student_list BEGIN
+        INSERT INTO people_search(rowid, name, identifier, kind, ref_id)
+        VALUES (new.id * 2, new.student_name, new.student_id, 'student', new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS student_search_update AFTER UPDATE OF student_name, student_id ON student_list BEGIN
+        UPDATE people_search SET name = new.student_name, identifier = new.student_id
+        WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS student_search_delete AFTER DELETE ON student_list BEGIN
+        DELETE FROM people_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS teacher_search_insert AFTER INSERT ON teacher_list BEGIN
+        INSERT INTO people_search(rowid, name, identifier, kind, ref_id)
+        VALUES (new.id * 2 + 1, new.teacher_name, new.staff_id, 'teacher', new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS teacher_search_update AFTER UPDATE OF teacher_name, staff_id ON teacher_list BEGIN
+        UPDATE people_search SET name = new.teacher_name, identifier = new.staff_id
+        WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS teacher_search_delete AFTER DELETE ON teacher_list BEGIN
+        DELETE FROM people_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SEARCH_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0003_jobs'),
+    ]
+
+    operations = [
+        # 反向遷移移除欄位時同樣會重建資料表，所以在最後（反向的最後一步）再補建一次
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='student',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
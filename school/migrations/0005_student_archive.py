@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0004_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedStudent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_pk', models.BigIntegerField(unique=True)),
+                ('student_name', models.CharField(max_length=64)),
+                ('student_id', models.CharField(max_length=24, unique=True)),
+                ('role', models.CharField(choices=[('student', 'Student'), ('class_president', 'Class President'), ('class_officer', 'Class Officer')], default='student', max_length=64)),
+                ('department_id', models.CharField(max_length=64)),
+                ('enroll_year', models.IntegerField()),
+                ('class_id', models.CharField(max_length=16)),
+                ('mentor_snapshot', models.JSONField(blank=True, null=True)),
+                ('advisor_snapshot', models.JSONField(blank=True, null=True)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'student_archive',
+                'ordering': ['student_pk'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['enroll_year'], name='student_lis_enroll__3fbe22_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedstudent',
+            name='advisor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_advisees', to='school.teacher'),
+        ),
+        migrations.AddField(
+            model_name='archivedstudent',
+            name='mentor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_mentees', to='school.teacher'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedstudent',
+            index=models.Index(fields=['enroll_year'], name='student_arc_enroll__8b037a_idx'),
+        ),
+    ]
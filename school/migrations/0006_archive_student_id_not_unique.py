@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0005_student_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedstudent',
+            name='student_id',
+            field=models.CharField(db_index=True, max_length=24),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0006_archive_student_id_not_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['student_name'], name='student_lis_student_0103c3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['teacher_name'], name='teacher_lis_teacher_ef83d7_idx'),
+        ),
+    ]
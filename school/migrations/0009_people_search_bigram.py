@@ -0,0 +1,103 @@
+from django.db import migrations
+
+# trigram 索引無法處理一、兩個字的查詢，也無法模糊比對三個字的中文姓名
+# 另建 bigram 索引：每個名字存成以空白分隔的 bigram（最後一個字單獨一個 token），
+# rowid 與 people_search 相同；people_search_position 提供 trigger 中切字用的位置 1..64
+FORWARD_SQL = [
+    'CREATE TABLE people_search_position (n INTEGER PRIMARY KEY)',
+    """
+    WITH RECURSIVE position(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM position WHERE n < 64)
+    INSERT INTO people_search_position(n) SELECT n FROM position
+    """,
+    """
+    CREATE VIRTUAL TABLE people_search_bigram USING fts5(
+        grams, tokenize = 'unicode61', prefix = '1'
+    )
+    """,
+    """
+    INSERT INTO people_search_bigram(rowid, grams)
+    SELECT s.id * 2, group_concat(substr(s.student_name, p.n, 2), ' ')
+    FROM student_list s JOIN people_search_position p ON p.n <= length(s.student_name)
+    GROUP BY s.id
+    """,
+    """
+    INSERT INTO people_search_bigram(rowid, grams)
+    SELECT t.id * 2 + 1, group_concat(substr(t.teacher_name, p.n, 2), ' ')
+    FROM teacher_list t JOIN people_search_position p ON p.n <= length(t.teacher_name)
+    GROUP BY t.id
+    """,
+    """
+    CREATE TRIGGER student_bigram_insert AFTER INSERT ON student_list BEGIN
+        INSERT INTO people_search_bigram(rowid, grams)
+        SELECT new.id * 2, group_concat(substr(new.student_name, n, 2), ' ')
+        FROM people_search_position WHERE n <= length(new.student_name);
+    END
+    """,
+    """
+    CREATE TRIGGER student_bigram_update AFTER UPDATE OF student_name ON student_list BEGIN
+        UPDATE people_search_bigram SET grams = (
+            SELECT group_concat(substr(new.student_name, n, 2), ' ')
+            FROM people_search_position WHERE n <= length(new.student_name)
+        )
+        WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER student_bigram_delete AFTER DELETE ON student_list BEGIN
+        DELETE FROM people_search_bigram WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER teacher_bigram_insert AFTER INSERT ON teacher_list BEGIN
+        INSERT INTO people_search_bigram(rowid, grams)
+        SELECT new.id * 2 + 1, group_concat(substr(new.teacher_name, n, 2), ' ')
+        FROM people_search_position WHERE n <= length(new.teacher_name);
+    END
+    """,
+    """
+    CREATE TRIGGER teacher_bigram_update AFTER UPDATE OF teacher_name ON teacher_list BEGIN
+        UPDATE people_search_bigram SET grams = (
+            SELECT group_concat(substr(new.teacher_name, n, 2), ' ')
+            FROM people_search_position WHERE n <= length(new.teacher_name)
+        )
+        WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER teacher_bigram_delete AFTER DELETE ON teacher_list BEGIN
+        DELETE FROM people_search_bigram WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS student_bigram_insert',
+    'DROP TRIGGER IF EXISTS student_bigram_update',
+    'DROP TRIGGER IF EXISTS student_bigram_delete',
+    'DROP TRIGGER IF EXISTS teacher_bigram_insert',
+    'DROP TRIGGER IF EXISTS teacher_bigram_update',
+    'DROP TRIGGER IF EXISTS teacher_bigram_delete',
+    'DROP TABLE IF EXISTS people_search_bigram',
+    'DROP TABLE IF EXISTS people_search_position',
+]
+
+
+def _run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        # FTS5 只有 SQLite 有，其他資料庫由 school.search 退回 icontains 查詢
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0008_stream_event'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run_on_sqlite(FORWARD_SQL), _run_on_sqlite(REVERSE_SQL)),
+    ]
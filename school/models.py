@@ -1,12 +1,54 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from datetime import datetime
 # Create your models here.
+class VersionConflict(Exception):
+    """更新時資料庫中的 version 已被其他請求改變"""
+
+class VersionedModel(models.Model):
+    """
+    樂觀鎖：每次更新以 UPDATE ... WHERE version = <讀取時的版本> 執行並將 version + 1
+    沒有更新到任何列（但資料仍存在）時拋出 VersionConflict，不需要持有任何鎖
+    """
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        expected = self.version
+        self.version = expected + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        self._expected_version = expected
+        try:
+            # 自己的 savepoint：衝突只回滾這次儲存，外層交易仍可繼續使用
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except Exception:
+            self.version = expected
+            raise
+        finally:
+            del self._expected_version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update, *args):
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update, *args)
+        updated = super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update, *args)
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            raise VersionConflict(f'{self._meta.object_name} {pk_val} is no longer at version {expected}.')
+        return updated
+
 class Title(models.TextChoices):
     PROFESSOR = 'professor', 'Professor'
     ASSOCIATE_PROFESSOR = 'associate_professor', 'Associate Professor'
     ASSISTANT_PROFESSOR = 'assistant_professor', 'Assistant Professor'
     LECTURER = 'lecturer', 'Lecturer'
-class Teacher(models.Model):
+class Teacher(VersionedModel):
     teacher_name = models.CharField(max_length = 64)
     staff_id = models.CharField(max_length= 24, unique=True)
     title = models.CharField(max_length=64, choices=Title.choices, default=Title.LECTURER)
@@ -18,12 +60,25 @@ class Teacher(models.Model):
     
     class Meta:
         db_table = 'teacher_list'
+        indexes = [models.Index(fields=['teacher_name'])]
+
+def current_school_year():
+    """八月後進入新學年"""
+    today = datetime.now()
+    if today.month >= 8:
+        return today.year
+    return today.year - 1
+
+def grade_for(enroll_year):
+    """入學後第一年為一年級，最小為 1"""
+    g = current_school_year() - enroll_year +1
+    return g if g > 0 else 1
 
 class Role(models.TextChoices):
     STUDENT = 'student', 'Student'
     CLASS_PRESIDENT = 'class_president', 'Class President'
     CLASS_OFFICER = 'class_officer', 'Class Officer'
-class Student(models.Model):
+class Student(VersionedModel):
     student_name = models.CharField(max_length = 64)
     student_id = models.CharField(max_length= 24, null = False, unique=True)
     role = models.CharField(max_length=64, choices=Role.choices, default=Role.STUDENT)
@@ -40,16 +95,111 @@ class Student(models.Model):
         根據 enroll_year 動態計算目前年級
         假設入學後第一年為一年級，八月後進入新學年
         """
-        today = datetime.now()
-        if today.month >= 8:
-            school_year = today.year
-        else:
-            school_year = today.year - 1
-        g = school_year - self.enroll_year +1
-        return g if g > 0 else 1
+        return grade_for(self.enroll_year)
 
     def __str__(self):
         return f"{self.student_id} {self.student_name}"
     
     class Meta:
-        db_table = 'student_list'
\ No newline at end of file
+        db_table = 'student_list'
+        indexes = [models.Index(fields=['enroll_year']), models.Index(fields=['student_name'])]
+
+class ArchivedStudent(models.Model):
+    """
+    已畢業學生的封存資料，由 archive_graduates 指令從 student_list 搬移過來
+    student_pk 保留原本的 id，mentor/advisor 另存當時的老師摘要，老師日後異動或刪除也不會遺失
+    """
+    student_pk = models.BigIntegerField(unique=True)
+    student_name = models.CharField(max_length = 64)
+    # 學號封存後可能被新生重新使用，封存表只以 student_pk 區分
+    student_id = models.CharField(max_length= 24, db_index=True)
+    role = models.CharField(max_length=64, choices=Role.choices, default=Role.STUDENT)
+    department_id = models.CharField(max_length = 64)
+    enroll_year = models.IntegerField()
+    class_id = models.CharField(max_length = 16)
+    mentor = models.ForeignKey(Teacher, related_name='archived_mentees', on_delete=models.SET_NULL, blank=True, null=True)
+    advisor = models.ForeignKey(Teacher, related_name='archived_advisees', on_delete=models.SET_NULL, blank=True, null=True)
+    mentor_snapshot = models.JSONField(blank=True, null=True)
+    advisor_snapshot = models.JSONField(blank=True, null=True)
+    version = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def grade(self):
+        return grade_for(self.enroll_year)
+
+    def __str__(self):
+        return f"{self.student_id} {self.student_name} (archived)"
+
+    class Meta:
+        db_table = 'student_archive'
+        ordering = ['student_pk']
+        indexes = [models.Index(fields=['enroll_year'])]
+
+class StreamEvent(models.Model):
+    """
+    /api/stream 的 outbox：寫入老師/學生的行程在同一個交易中新增一列
+    提供串流的行程輪詢新的列再分送給自己的訂閱者，寫入與串流可以在不同的行程
+    """
+    type = models.CharField(max_length=16)
+    model = models.CharField(max_length=16)
+    object_id = models.BigIntegerField()
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    attrs = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.pk} {self.model}.{self.type} {self.object_id}"
+
+    class Meta:
+        db_table = 'stream_event'
+
+class JobKind(models.TextChoices):
+    STUDENT_CREATE = 'student.create', 'Create students'
+    STUDENT_UPDATE = 'student.update', 'Update students'
+    STUDENT_IMPORT = 'student.import', 'Import students'
+    TEACHER_CREATE = 'teacher.create', 'Create teachers'
+    TEACHER_UPDATE = 'teacher.update', 'Update teachers'
+    TEACHER_IMPORT = 'teacher.import', 'Import teachers'
+
+class JobStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    RUNNING = 'running', 'Running'
+    SUCCEEDED = 'succeeded', 'Succeeded'
+    FAILED = 'failed', 'Failed'
+class Job(models.Model):
+    kind = models.CharField(max_length=32, choices=JobKind.choices)
+    status = models.CharField(max_length=16, choices=JobStatus.choices, default=JobStatus.PENDING)
+    payload = models.JSONField(default=list)
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    succeeded = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='jobs', on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # 執行中的 runner 與它最後一次完成批次的時間，逾時的 running 工作才會被重新排入
+    owner = models.CharField(max_length=128, blank=True, default='')
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.pk} {self.kind} {self.status}"
+
+    class Meta:
+        db_table = 'job_list'
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+class JobResult(models.Model):
+    job = models.ForeignKey(Job, related_name='results', on_delete=models.CASCADE)
+    index = models.IntegerField()
+    status = models.CharField(max_length=16)
+    object_id = models.BigIntegerField(blank=True, null=True)
+    errors = models.JSONField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'job_result_list'
+        ordering = ['index']
+        constraints = [models.UniqueConstraint(fields=['job', 'index'], name='unique_job_result_index')]
@@ -0,0 +1,85 @@
+# school/renderers.py
+
+import datetime
+import decimal
+import uuid
+
+import msgpack
+from django.http.request import MediaType
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+COLUMNAR = 'columnar'
+
+
+def to_columnar(rows):
+    """
+    [{...}, {...}] -> {'columns': [...], 'rows': [[...], [...]]}，欄位名稱只出現一次
+    欄位取所有列的聯集（依出現順序），某列沒有的欄位填 None，例如封存學生的 archived
+    """
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    return {'columns': columns, 'rows': [[row.get(column) for column in columns] for row in rows]}
+
+
+def from_columnar(data):
+    if not isinstance(data, dict) or not isinstance(data.get('columns'), list) or not isinstance(data.get('rows'), list):
+        raise ParseError('Columnar payload must be an object with "columns" and "rows" lists.')
+    columns = data['columns']
+    if not all(isinstance(column, str) for column in columns) or len(set(columns)) != len(columns):
+        raise ParseError('Columnar "columns" must be a list of distinct strings.')
+    for index, row in enumerate(data['rows']):
+        if not isinstance(row, (list, tuple)) or len(row) != len(columns):
+            raise ParseError(f'Columnar row {index} must be a list of {len(columns)} values.')
+    return [dict(zip(columns, row)) for row in data['rows']]
+
+
+def is_columnar(media_type):
+    return bool(media_type) and MediaType(media_type).params.get('layout') == COLUMNAR
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID, Promise)):
+        return str(value)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f'Object of type {type(value).__name__} is not MessagePack serializable')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack 回應；Accept 帶 layout=columnar 時，列表改成「一個欄位表頭 + 每列一個陣列」
+    例如 Accept: application/msgpack; layout=columnar
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if is_columnar(accepted_media_type) and isinstance(data, list) and data and all(isinstance(row, dict) for row in data):
+            data = to_columnar(data)
+            response = (renderer_context or {}).get('response')
+            if response is not None:
+                # 讓用戶端從 Content-Type 得知要用 columnar 方式解讀
+                response['Content-Type'] = f'{self.media_type}; layout={COLUMNAR}'
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """解析 MessagePack 請求；Content-Type 帶 layout=columnar 時還原成物件列表"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            data = msgpack.unpackb(stream.read(), raw=False)
+        except Exception as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+        if is_columnar(media_type):
+            data = from_columnar(data)
+        return data
@@ -0,0 +1,58 @@
+# school/routing.py
+
+import threading
+
+from django.urls import re_path
+from django.utils.module_loading import import_string
+
+LIST_ACTIONS = {'get': 'list', 'post': 'create'}
+DETAIL_ACTIONS = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+
+# Django 在建立 URL 查詢表時會檢查這些屬性，不能因此觸發匯入
+_UNLOADED_ATTRIBUTES = {'view_class'}
+
+
+class LazyView:
+    """
+    第一次處理請求時才匯入 viewset 並呼叫 as_view()
+    URLconf 載入與 reverse() 都不會匯入 school.views 及其依賴（serializers、jobs、batch…）
+    其他屬性（cls、actions、csrf_exempt 等）轉給實際的 view
+    """
+
+    def __init__(self, dotted_path, actions, **initkwargs):
+        self._dotted_path = dotted_path
+        self._actions = actions
+        self._initkwargs = initkwargs
+        self._view = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._view is None:
+            with self._lock:
+                if self._view is None:
+                    viewset = import_string(self._dotted_path)
+                    self._view = viewset.as_view(self._actions, **self._initkwargs)
+        return self._view
+
+    def __call__(self, request, *args, **kwargs):
+        return self._load()(request, *args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name in _UNLOADED_ATTRIBUTES:
+            raise AttributeError(name)
+        return getattr(self._load(), name)
+
+    def __repr__(self):
+        return f'<LazyView {self._dotted_path}>'
+
+
+def viewset_urls(prefix, dotted_path, basename, list_actions=None, detail_actions=None):
+    """產生與 DefaultRouter(trailing_slash=False) 相同的 list/detail 路由與名稱"""
+    patterns = []
+    if list_actions:
+        view = LazyView(dotted_path, list_actions, basename=basename, detail=False, suffix='List')
+        patterns.append(re_path(rf'^{prefix}$', view, name=f'{basename}-list'))
+    if detail_actions:
+        view = LazyView(dotted_path, detail_actions, basename=basename, detail=True, suffix='Instance')
+        patterns.append(re_path(rf'^{prefix}/(?P<pk>[^/.]+)$', view, name=f'{basename}-detail'))
+    return patterns
@@ -0,0 +1,197 @@
+# school/search.py
+
+from itertools import combinations
+
+from django.db import connection
+
+from .models import Student, Teacher
+
+KINDS = ('student', 'teacher')
+
+# trigram tokenizer 至少需要三個字元才能走索引，更短的查詢改用 people_search_bigram
+MIN_TRIGRAM_LENGTH = 3
+
+# 少於這個長度的查詢（例如三個字的中文姓名）trigram 太少，模糊比對改用 bigram
+MIN_FUZZY_TRIGRAM_LENGTH = 5
+
+# 每個查詢最多從索引取出 limit * CANDIDATE_FACTOR 筆候選，再於 Python 中排序，
+# 避免常見字串（例如常見姓氏）在整個索引上計算 rank
+CANDIDATE_FACTOR = 5
+
+# 模糊比對只取散布在查詢字串中的 FUZZY_GRAMS 個 gram，候選至少要命中其中 FUZZY_MIN_MATCHES 個
+# （gram 太少時少命中一個即可），最後再要求候選包含查詢中至少 FUZZY_MIN_SHARE 比例的 gram
+FUZZY_GRAMS = 4
+FUZZY_MIN_MATCHES = 2
+FUZZY_MIN_SHARE = 0.5
+
+IDENTIFIER_FIELDS = {
+    'student': (Student, 'student_name', 'student_id'),
+    'teacher': (Teacher, 'teacher_name', 'staff_id'),
+}
+
+FTS_QUERIES = {
+    'trigram': 'SELECT kind, ref_id, name, identifier FROM people_search WHERE people_search MATCH %s',
+    'bigram': (
+        'SELECT kind, ref_id, name, identifier FROM people_search_bigram '
+        'JOIN people_search ON people_search.rowid = people_search_bigram.rowid '
+        'WHERE people_search_bigram MATCH %s'
+    ),
+}
+
+
+def _quote(gram):
+    return '"%s"' % gram.replace('"', '""')
+
+
+def _trigrams(text):
+    text = text.lower()
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+def _bigrams(text):
+    """只取兩個字都是文字或數字的 bigram，與 unicode61 tokenizer 切出的 token 一致"""
+    text = text.lower()
+    return [text[i:i + 2] for i in range(len(text) - 1) if text[i:i + 2].isalnum()]
+
+
+def _short_query(text):
+    """一、兩個字的子字串比對：兩個字直接比對 bigram token，一個字則比對以該字開頭的 token"""
+    if len(text) == 2 and text.isalnum():
+        return _quote(text)
+    if len(text) == 1 and text.isalnum():
+        return _quote(text) + '*'
+    return None
+
+
+def _fuzzy_query(grams):
+    """
+    從查詢字串頭、中、尾平均挑出幾個 gram，要求候選至少命中其中兩個
+    拼錯一兩個字只會破壞相鄰的幾個 gram，仍有足夠的 gram 命中；
+    以 AND 組合讓 FTS5 只需要交集幾個 posting list，不會掃過所有含常見 gram 的列
+    """
+    if len(grams) > FUZZY_GRAMS:
+        grams = [grams[round(i * (len(grams) - 1) / (FUZZY_GRAMS - 1))] for i in range(FUZZY_GRAMS)]
+    grams = list(dict.fromkeys(grams))
+    # 只有兩、三個 gram 時（例如三個字的姓名拼錯一個字）要求全部命中就等於精確比對
+    required = min(FUZZY_MIN_MATCHES, max(len(grams) - 1, 1))
+    return ' OR '.join(
+        '(%s)' % ' AND '.join(_quote(gram) for gram in combination)
+        for combination in combinations(grams, required)
+    )
+
+
+def _similarity(grams, name, split):
+    grams = set(grams)
+    return len(grams & set(split(name))) / len(grams)
+
+
+def _fts_rows(index, query, kinds, limit):
+    kind_placeholders = ', '.join(['%s'] * len(kinds))
+    sql = f'{FTS_QUERIES[index]} AND kind IN ({kind_placeholders}) LIMIT %s'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [query, *kinds, limit * CANDIDATE_FACTOR])
+        return cursor.fetchall()
+
+
+def _search_names_fts(text, kinds, limit):
+    # 先做子字串比對（選擇性高、速度快），依名字長度排序（越短越接近查詢）
+    if len(text) >= MIN_TRIGRAM_LENGTH:
+        rows = _fts_rows('trigram', _quote(text), kinds, limit)
+    else:
+        query = _short_query(text)
+        rows = _fts_rows('bigram', query, kinds, limit) if query else []
+    rows = sorted(rows, key=lambda row: len(row[2]))[:limit]
+    if len(rows) < limit and len(text) >= MIN_TRIGRAM_LENGTH:
+        # 不足 limit 筆才做模糊比對，依命中 gram 的比例排序
+        index, split = ('trigram', _trigrams) if len(text) >= MIN_FUZZY_TRIGRAM_LENGTH else ('bigram', _bigrams)
+        grams = split(text)
+        if grams:
+            scored = [(_similarity(grams, row[2], split), row) for row in _fts_rows(index, _fuzzy_query(grams), kinds, limit)]
+            scored = [item for item in scored if item[0] >= FUZZY_MIN_SHARE]
+            scored.sort(key=lambda item: (-item[0], abs(len(item[1][2]) - len(text))))
+            rows += [row for _, row in scored]
+    return [
+        {'kind': kind, 'id': ref_id, 'name': name, 'identifier': identifier, 'match': 'name'}
+        for kind, ref_id, name, identifier in rows
+    ]
+
+
+def _prefix(field, text):
+    return {f'{field}__gte': text, f'{field}__lt': text + '\U0010ffff'}
+
+
+def _search_name_prefixes(text, kinds, limit):
+    """
+    一、兩個字的查詢先做姓名前綴比對（走 student_name/teacher_name 索引），開頭相符的排在前面
+    除了原字串也試首字大寫與全大寫，讓 "jo" 可以找到 "Jonathan"
+    """
+    results = []
+    for kind in kinds:
+        model, name_field, identifier_field = IDENTIFIER_FIELDS[kind]
+        for variant in dict.fromkeys([text, text.capitalize(), text.upper()]):
+            rows = (
+                model.objects
+                .filter(**_prefix(name_field, variant))
+                .order_by(name_field)
+                .values_list('id', name_field, identifier_field)[:limit]
+            )
+            results.extend(
+                {'kind': kind, 'id': pk, 'name': name, 'identifier': identifier, 'match': 'name'}
+                for pk, name, identifier in rows
+            )
+    return results
+
+
+def _search_names_fallback(text, kinds, limit):
+    results = []
+    for kind in kinds:
+        model, name_field, identifier_field = IDENTIFIER_FIELDS[kind]
+        rows = model.objects.filter(**{f'{name_field}__icontains': text}).values_list('id', name_field, identifier_field)[:limit]
+        results.extend(
+            {'kind': kind, 'id': pk, 'name': name, 'identifier': identifier, 'match': 'name'}
+            for pk, name, identifier in rows
+        )
+    return results[:limit]
+
+
+def _search_identifiers(text, kinds, limit):
+    """以範圍條件做 student_id / staff_id 前綴比對，可以直接走 unique index"""
+    results = []
+    for kind in kinds:
+        model, name_field, identifier_field = IDENTIFIER_FIELDS[kind]
+        rows = (
+            model.objects
+            .filter(**_prefix(identifier_field, text))
+            .order_by(identifier_field)
+            .values_list('id', name_field, identifier_field)[:limit]
+        )
+        results.extend(
+            {'kind': kind, 'id': pk, 'name': name, 'identifier': identifier, 'match': 'identifier'}
+            for pk, name, identifier in rows
+        )
+    return results
+
+
+def search_people(text, kind=None, limit=20):
+    """
+    依姓名（模糊）或學號/教職員編號（前綴）搜尋學生與老師
+    學號前綴命中的結果排在姓名命中之前，同一人只會出現一次
+    """
+    text = text.strip()
+    kinds = [kind] if kind else list(KINDS)
+    if not text:
+        return []
+    name_results = _search_name_prefixes(text, kinds, limit) if len(text) < MIN_TRIGRAM_LENGTH else []
+    if connection.vendor == 'sqlite':
+        name_results += _search_names_fts(text, kinds, limit + len(name_results))
+    else:
+        # 沒有 FTS5 時以 icontains 比對，查詢帶 LIMIT，找到 limit 筆就停止
+        name_results += _search_names_fallback(text, kinds, limit + len(name_results))
+
+    results, seen = [], set()
+    for result in _search_identifiers(text, kinds, limit) + name_results:
+        key = (result['kind'], result['id'])
+        if key not in seen:
+            seen.add(key)
+            results.append(result)
+    return results[:limit]
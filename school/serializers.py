@@ -1,7 +1,10 @@
 # school/serialiers.py
 
 from rest_framework import serializers
-from .models import Teacher, Student
+from django.conf import settings
+from django.db import models
+from .models import Teacher, Student, ArchivedStudent, Job, JobKind, JobResult
+from .summaries import teacher_summaries
 
 class TeacherSimpleSerializer(serializers.ModelSerializer):
     
@@ -29,11 +32,33 @@ class TeacherSerializer(serializers.ModelSerializer):
                     'department_id', 
                     'created_at', 
                     'mentees',
-                    'advisees'
+                    'advisees',
+                    'version'
                 ]
+        read_only_fields = ['version']
+
+class TeacherSummaryField(serializers.Field):
+    """以老師 id 從 teacher_summaries 取出與 TeacherSimpleSerializer 相同的內容"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return teacher_summaries.get(value)
+
+class StudentListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        # 一次載入整頁學生會用到的老師摘要，避免逐列查詢
+        students = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        teacher_summaries.get_many(
+            pk for student in students for pk in (student.mentor_id, student.advisor_id) if pk is not None
+        )
+        return super().to_representation(students)
 
 class StudentSerializer(serializers.ModelSerializer):
-    mentor = TeacherSimpleSerializer(read_only=True)
+    mentor = TeacherSummaryField(source='mentor_id')
     mentor_id = serializers.PrimaryKeyRelatedField(
         queryset=Teacher.objects.all(),
         write_only=True,
@@ -41,7 +66,7 @@ class StudentSerializer(serializers.ModelSerializer):
         required=False,
         allow_null=True 
     )
-    advisor = TeacherSimpleSerializer(read_only=True)
+    advisor = TeacherSummaryField(source='advisor_id')
     advisor_id = serializers.PrimaryKeyRelatedField(
         queryset=Teacher.objects.all(),
         write_only=True,
@@ -49,8 +74,15 @@ class StudentSerializer(serializers.ModelSerializer):
         required=False,
         allow_null=True 
     )
+    def to_representation(self, instance):
+        if self.parent is None:
+            # 單筆時也一次取回導師與指導老師
+            teacher_summaries.get_many(pk for pk in (instance.mentor_id, instance.advisor_id) if pk is not None)
+        return super().to_representation(instance)
+
     class Meta:
         model = Student
+        list_serializer_class = StudentListSerializer
         fields = [
                     'id',
                     'student_name', 
@@ -64,5 +96,99 @@ class StudentSerializer(serializers.ModelSerializer):
                     'mentor_id', 
                     'advisor',
                     'advisor_id',
-                    'created_at'
-                  ]
\ No newline at end of file
+                    'created_at',
+                    'version'
+                  ]
+        read_only_fields = ['version']
+
+class ArchivedStudentSerializer(serializers.ModelSerializer):
+    """封存學生，欄位與 StudentSerializer 的輸出相同，mentor/advisor 為封存當時的老師摘要"""
+    id = serializers.IntegerField(source='student_pk', read_only=True)
+    mentor = serializers.JSONField(source='mentor_snapshot', read_only=True)
+    advisor = serializers.JSONField(source='advisor_snapshot', read_only=True)
+    archived = serializers.SerializerMethodField()
+
+    def get_archived(self, obj):
+        return True
+
+    class Meta:
+        model = ArchivedStudent
+        fields = [
+                    'id',
+                    'student_name',
+                    'student_id',
+                    'role',
+                    'department_id',
+                    'enroll_year',
+                    'grade',
+                    'class_id',
+                    'mentor',
+                    'advisor',
+                    'created_at',
+                    'version',
+                    'archived',
+                    'archived_at'
+                  ]
+        read_only_fields = fields
+
+class JobResultSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = JobResult
+        fields = ['index', 'status', 'object_id', 'errors']
+
+class JobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Job
+        fields = [
+                    'id',
+                    'kind',
+                    'status',
+                    'total',
+                    'processed',
+                    'succeeded',
+                    'failed',
+                    'error',
+                    'created_at',
+                    'started_at',
+                    'finished_at'
+                ]
+
+class JobDetailSerializer(JobSerializer):
+    results = JobResultSerializer(many=True, read_only=True)
+
+    class Meta(JobSerializer.Meta):
+        fields = JobSerializer.Meta.fields + ['results']
+
+class JobCreateSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=JobKind.choices)
+    rows = serializers.ListField(child=serializers.JSONField(), allow_empty=False)
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.RegexField(r'^/api/')
+    body = serializers.JSONField(required=False, allow_null=True)
+    headers = serializers.DictField(child=serializers.CharField(), required=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and isinstance(data.get('method'), str):
+            data = dict(data, method=data['method'].upper())
+        return super().to_internal_value(data)
+
+    def validate_headers(self, value):
+        from .batch import ALLOWED_HEADERS
+
+        unsupported = sorted(name for name in value if name.lower() not in ALLOWED_HEADERS)
+        if unsupported:
+            raise serializers.ValidationError(f'Unsupported headers: {", ".join(unsupported)}.')
+        return value
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        limit = getattr(settings, 'SCHOOL_BATCH_MAX_REQUESTS', 50)
+        if len(value) > limit:
+            raise serializers.ValidationError(f'At most {limit} requests are allowed per batch.')
+        return value
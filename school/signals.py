@@ -0,0 +1,96 @@
+# school/signals.py
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token, forget_user
+from .events import build_event, record_event
+from .identity import discard_identity
+from .models import Student, Teacher
+from .summaries import teacher_summaries
+
+
+def _publish(kind, model_name, instance):
+    discard_identity(instance)
+    # 延後載入 serializers，app 啟動時不需要匯入整個 DRF serializer 模組
+    from .serializers import StudentSimpleSerializer, TeacherSimpleSerializer
+
+    serializer_class = TeacherSimpleSerializer if model_name == 'teacher' else StudentSimpleSerializer
+    # 寫入 outbox 而不是直接 publish：訂閱者可能在其他 worker 或另一個 ASGI 服務
+    record_event(build_event(kind, model_name, instance, serializer_class(instance).data))
+
+
+@receiver(post_save, sender=Teacher)
+def teacher_saved(sender, instance, created, **kwargs):
+    teacher_summaries.invalidate_on_commit(instance.pk)
+    _publish('created' if created else 'updated', 'teacher', instance)
+
+
+@receiver(post_delete, sender=Teacher)
+def teacher_deleted(sender, instance, **kwargs):
+    teacher_summaries.invalidate_on_commit(instance.pk)
+    _publish('deleted', 'teacher', instance)
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, created, **kwargs):
+    _publish('created' if created else 'updated', 'student', instance)
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    _publish('deleted', 'student', instance)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_token(instance.key, instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # 登入時只更新 last_login，不影響認證結果
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+def _forget_users(user_ids):
+    for user_id in user_ids:
+        forget_user(user_id)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+def user_access_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # 使用者的群組或權限異動後，快取中的使用者需重新載入
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            forget_user(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        _forget_users(pk_set)
+    elif action == 'pre_clear':
+        _forget_users(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    # 群組權限異動影響群組內所有使用者
+    if not reverse:
+        groups = [instance]
+    elif action == 'pre_clear':
+        groups = Group.objects.filter(permissions=instance)
+    else:
+        groups = Group.objects.filter(pk__in=pk_set)
+    _forget_users(get_user_model().objects.filter(groups__in=groups).values_list('pk', flat=True).distinct())
@@ -0,0 +1,207 @@
+# school/slowlog.py
+
+import hashlib
+import re
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+DEFAULTS = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'EXPLAIN': True,
+    'SIZE': 500,
+    'CACHE': 'default',
+}
+
+MAX_PARAM_LENGTH = 200
+
+# batch 執行子請求時設定，查詢歸屬到子請求的 view/action 而不是 BatchViewSet
+current_subrequest = ContextVar('school_slow_query_subrequest', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN \(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def slow_query_option(name):
+    return getattr(settings, 'SCHOOL_SLOW_QUERY_LOG', {}).get(name, DEFAULTS[name])
+
+
+def normalize_sql(sql):
+    """
+    把 SQL 化成查詢形狀：常數與參數換成 ?，IN 清單收成 IN (...)
+    只有參數不同的查詢會得到相同的形狀
+    """
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+def fingerprint(shape):
+    return hashlib.sha1(shape.encode()).hexdigest()[:12]
+
+
+def _safe_params(params, many):
+    if many:
+        return f'{len(params)} row(s)'
+    if isinstance(params, dict):
+        return {key: _safe_param(value) for key, value in params.items()}
+    return [_safe_param(value) for value in params or ()]
+
+
+def _safe_param(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return str(value)[:MAX_PARAM_LENGTH]
+
+
+class SlowQueryLog:
+    """
+    存放在 Django cache 的環狀緩衝區，最多保留 size 筆，舊的會被新的覆蓋
+    使用共用的 cache backend 時，manage.py slow_queries 可以讀到各 worker 記下的查詢
+    """
+    prefix = 'school:slowq'
+
+    def __init__(self, alias=None, size=None):
+        self.alias = alias
+        self.size = size
+
+    @property
+    def cache(self):
+        return caches[self.alias or slow_query_option('CACHE')]
+
+    @property
+    def capacity(self):
+        return self.size or slow_query_option('SIZE')
+
+    def append(self, entry):
+        cache = self.cache
+        cache.add(f'{self.prefix}:seq', 0, timeout=None)
+        seq = cache.incr(f'{self.prefix}:seq')
+        cache.set(f'{self.prefix}:{seq % self.capacity}', dict(entry, seq=seq), timeout=None)
+        return seq
+
+    def entries(self):
+        """依寫入順序回傳目前保留的紀錄"""
+        keys = [f'{self.prefix}:{slot}' for slot in range(self.capacity)]
+        return sorted(self.cache.get_many(keys).values(), key=lambda entry: entry['seq'])
+
+    def clear(self):
+        cache = self.cache
+        cache.delete_many([f'{self.prefix}:{slot}' for slot in range(self.capacity)] + [f'{self.prefix}:seq'])
+
+
+slow_query_log = SlowQueryLog()
+
+
+def aggregate(entries):
+    """依查詢形狀彙總，依總耗時由大到小排序"""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'shape': entry['shape'],
+            'count': 0,
+            'errors': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'views': set(),
+            'latest': entry,
+        })
+        group['count'] += 1
+        group['errors'] += 1 if entry.get('error') else 0
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        group['views'].add(f"{entry['view']}.{entry['action']}" if entry['action'] else entry['view'])
+        if entry['seq'] > group['latest']['seq']:
+            group['latest'] = entry
+    return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+
+
+class SlowQueryRecorder:
+    """
+    connection.execute_wrapper 使用的 wrapper，記錄一個請求中超過門檻的查詢
+    EXPLAIN 本身也經過同一個 wrapper，以 _explaining 避免遞迴
+    """
+
+    def __init__(self, request, log=None, threshold_ms=None, explain=None):
+        self.request = request
+        self.log = log or slow_query_log
+        self.threshold_ms = slow_query_option('THRESHOLD_MS') if threshold_ms is None else threshold_ms
+        self.explain = slow_query_option('EXPLAIN') if explain is None else explain
+        self._explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        error = None
+        try:
+            return execute(sql, params, many, context)
+        except Exception as exc:
+            # 例如 SQLite 等到 busy timeout 後的 "database is locked"，同樣要記錄耗時
+            error = exc
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.record(context['connection'], sql, params, many, duration_ms, error)
+
+    def current_request(self):
+        """正在執行的 batch 子請求優先，否則為外層請求"""
+        return current_subrequest.get() or self.request
+
+    def origin(self, request):
+        """從 resolver_match 取出 view 與 DRF action"""
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None, None
+        view_class = getattr(match.func, 'cls', None)
+        view = view_class.__name__ if view_class is not None else match.view_name
+        actions = getattr(match.func, 'actions', None) or {}
+        return view, actions.get(request.method.lower())
+
+    def plan(self, connection, sql, params):
+        if not connection.features.supports_explaining_query_execution:
+            return None
+        self._explaining = True
+        try:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                    return [str(row[-1]) for row in cursor.fetchall()]
+        except DatabaseError as error:
+            return [f'EXPLAIN failed: {error}']
+        finally:
+            self._explaining = False
+
+    def record(self, connection, sql, params, many, duration_ms, error=None):
+        shape = normalize_sql(sql)
+        request = self.current_request()
+        view, action = self.origin(request)
+        # 失敗的查詢不做 EXPLAIN：連線可能仍被鎖住，或交易已無法再執行查詢
+        explain = self.explain and error is None and not many and sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+        self.log.append({
+            'fingerprint': fingerprint(shape),
+            'shape': shape,
+            'sql': sql,
+            'params': _safe_params(params, many),
+            'duration_ms': round(duration_ms, 3),
+            'database': connection.alias,
+            'view': view,
+            'action': action,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'plan': self.plan(connection, sql, params) if explain else None,
+            'error': f'{type(error).__name__}: {error}' if error is not None else None,
+            'at': timezone.now().isoformat(),
+        })
@@ -0,0 +1,59 @@
+# school/stream.py
+
+import json
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .events import broker
+
+EVENT_FILTERS = ('model', 'department_id', 'class_id')
+
+def format_sse(event):
+    payload = {key: event[key] for key in ('type', 'model', 'id', 'data')}
+    return f"id: {event['seq']}\nevent: {event['model']}.{event['type']}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+@require_GET
+async def event_stream(request):
+    """
+    以 Server-Sent Events 推送 Teacher / Student 的新增、更新、刪除
+    可用 ?model=、?department_id=、?class_id= 過濾，需以 ASGI (mysite/asgi.py) 提供服務
+    事件來自 stream_event outbox，寫入可以發生在任何 worker 或行程
+    """
+    if not isinstance(request, ASGIRequest):
+        # WSGI 無法消費 async 串流，連線會永遠佔住一個 worker
+        return JsonResponse(
+            {'detail': 'The event stream requires an ASGI server (mysite.asgi:application); this deployment serves WSGI.'},
+            status=501,
+        )
+    filters = {key: request.GET[key] for key in EVENT_FILTERS if request.GET.get(key)}
+    heartbeat = getattr(settings, 'SCHOOL_EVENT_HEARTBEAT', 15)
+    subscription = broker.subscribe(filters)
+    try:
+        await broker.ensure_relay()
+    except Exception:
+        subscription.close()
+        raise
+
+    async def stream():
+        try:
+            yield ': connected\n\n'
+            while True:
+                event = await subscription.get(timeout=heartbeat)
+                dropped = subscription.take_dropped()
+                if dropped:
+                    # 通知客戶端有事件被丟棄，應重新抓取完整資料
+                    yield f"event: overflow\ndata: {json.dumps({'dropped': dropped})}\n\n"
+                if event is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_sse(event)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
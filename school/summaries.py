@@ -0,0 +1,77 @@
+# school/summaries.py
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django.db import transaction
+
+from .cache import LRUCache
+from .models import Teacher
+
+# 與 TeacherSimpleSerializer 的欄位相同
+SUMMARY_FIELDS = ['id', 'teacher_name', 'title', 'department_id']
+
+
+class TeacherSummaryCache:
+    """
+    兩層的老師摘要快取：行程內 LRU -> 共用的 Django cache -> 資料庫
+    StudentSerializer 直接以 mentor_id / advisor_id 取用，不需要 join 也不需要逐列序列化老師
+    回傳的 dict 會被多個學生共用，請勿修改
+    """
+    key_prefix = 'teacher-summary:'
+
+    def __init__(self, local, shared, timeout):
+        self.local = local
+        self.shared = shared
+        self.timeout = timeout
+
+    def key(self, pk):
+        return f'{self.key_prefix}{pk}'
+
+    def get(self, pk):
+        summary = self.local.get(pk)
+        if summary is None:
+            summary = self.get_many([pk]).get(pk)
+        return summary
+
+    def get_many(self, ids):
+        found, missing = {}, []
+        for pk in set(ids):
+            summary = self.local.get(pk)
+            if summary is None:
+                missing.append(pk)
+            else:
+                found[pk] = summary
+
+        if missing:
+            shared = self.shared.get_many([self.key(pk) for pk in missing])
+            for pk in missing:
+                summary = shared.get(self.key(pk))
+                if summary is not None:
+                    found[pk] = summary
+                    self.local.set(pk, summary)
+            missing = [pk for pk in missing if pk not in found]
+
+        if missing:
+            loaded = {row['id']: row for row in Teacher.objects.filter(pk__in=missing).values(*SUMMARY_FIELDS)}
+            self.shared.set_many({self.key(pk): summary for pk, summary in loaded.items()}, self.timeout)
+            for pk, summary in loaded.items():
+                self.local.set(pk, summary)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, pk):
+        self.local.delete(pk)
+        self.shared.delete(self.key(pk))
+
+    def invalidate_on_commit(self, pk):
+        # 立即清除一次，commit 後再清一次，避免交易期間被其他請求寫回舊資料
+        self.invalidate(pk)
+        transaction.on_commit(lambda: self.invalidate(pk))
+
+
+_options = getattr(settings, 'SCHOOL_TEACHER_SUMMARY_CACHE', {})
+teacher_summaries = TeacherSummaryCache(
+    LRUCache(maxsize=_options.get('MAXSIZE', 2048), ttl=_options.get('TTL', 60)),
+    shared_cache,
+    _options.get('TIMEOUT', 3600),
+)
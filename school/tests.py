@@ -1,12 +1,43 @@
 # school/tests.py
-from django.test import TestCase
-from django.urls import reverse
-from django.contrib.auth.models import User
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.db.backends.utils import CursorWrapper
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.core.management import call_command
+from django.contrib.auth.models import Permission, User
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
-from datetime import datetime
-from .models import Teacher, Student, Title, Role
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest.mock import patch, PropertyMock
+import asyncio
+import msgpack
+import os
+import subprocess
+import sys
+import threading
+import time
+from .authentication import CachedTokenAuthentication, token_cache
+from .cache import LRUCache
+from .checks import check_shared_cache
+from .coalescing import SharedFlight, SingleFlight
+from .events import EventBroker, broker, fetch_events
+from .graph import build_graph
+from .jobs import enqueue, run_job
+from .routing import LazyView
+from .serializers import TeacherSimpleSerializer
+from .slowlog import SlowQueryLog, aggregate, normalize_sql, slow_query_log
+from .summaries import teacher_summaries
+from .throttling import TokenBucketThrottle
+from .views import teacher_list_flight
+from .stream import format_sse
+from .models import Teacher, Student, ArchivedStudent, StreamEvent, Job, Title, Role, JobKind, JobStatus, VersionConflict, current_school_year
 
 class BaseTestCase(APITestCase):
     """基礎測試類，設置常用的測試數據和認證"""
@@ -533,3 +564,981 @@ class EdgeCaseTest(BaseTestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+
+class EventStreamTest(TestCase):
+    """測試事件推送 broker 與 signal"""
+
+    def test_broker_filters_by_department(self):
+        """測試訂閱者只收到符合過濾條件的事件"""
+        local_broker = EventBroker()
+
+        async def scenario():
+            cs = local_broker.subscribe({'department_id': 'CS'})
+            ee = local_broker.subscribe({'department_id': 'EE'})
+            local_broker.publish({'type': 'created', 'model': 'teacher', 'id': 1, 'data': {}, 'attrs': {'department_id': 'CS'}})
+            await asyncio.sleep(0)
+            return await cs.get(timeout=1), await ee.get(timeout=0.01)
+
+        cs_event, ee_event = asyncio.run(scenario())
+        self.assertEqual(cs_event['id'], 1)
+        self.assertIsNone(ee_event)
+
+    def test_broker_drops_oldest_when_full(self):
+        """測試佇列滿時丟棄最舊事件並記錄數量"""
+        local_broker = EventBroker()
+
+        async def scenario():
+            subscription = local_broker.subscribe(maxsize=2)
+            for pk in range(1, 5):
+                local_broker.publish({'type': 'updated', 'model': 'student', 'id': pk, 'data': {}, 'attrs': {}})
+            await asyncio.sleep(0)
+            events = [await subscription.get(timeout=1) for _ in range(2)]
+            return events, subscription.take_dropped()
+
+        events, dropped = asyncio.run(scenario())
+        self.assertEqual([event['id'] for event in events], [3, 4])
+        self.assertEqual(dropped, 2)
+
+    def test_model_signal_writes_outbox(self):
+        """測試儲存教師時在同一個交易寫入 outbox，rollback 時一併取消"""
+        teacher = Teacher.objects.create(teacher_name='推播教師', staff_id='EV001', department_id='CS')
+        event = fetch_events(0, 10)[-1]
+        self.assertEqual(event['type'], 'created')
+        self.assertEqual(event['model'], 'teacher')
+        self.assertEqual(event['id'], teacher.pk)
+        self.assertEqual(event['attrs']['department_id'], 'CS')
+        self.assertIn('event: teacher.created', format_sse(event))
+
+        count = StreamEvent.objects.count()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Teacher.objects.create(teacher_name='回滾教師', staff_id='EV002', department_id='CS')
+            raise RuntimeError
+        self.assertEqual(StreamEvent.objects.count(), count)
+
+    def test_stream_refuses_wsgi(self):
+        """測試非 ASGI 請求直接回傳 501，不佔住 worker"""
+        response = self.client.get(reverse('event-stream'))
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(broker.subscriber_count, 0)
+
+
+@override_settings(SCHOOL_EVENT_POLL_INTERVAL=0.05)
+class EventStreamRelayTest(TransactionTestCase):
+    """測試 /api/stream 收到其他連線（模擬其他 worker）寫入的事件"""
+
+    async def test_stream_delivers_event_written_by_another_connection(self):
+        """測試 ASGI 串流讀到另一個執行緒的連線 commit 的異動"""
+        response = await self.async_client.get(reverse('event-stream'), {'department_id': 'CS'})
+        self.assertEqual(response.status_code, 200)
+        chunks = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await anext(chunks), b': connected\n\n')
+
+            def write_elsewhere():
+                try:
+                    Teacher.objects.create(teacher_name='他處教師', staff_id='EV100', department_id='EE')
+                    return Teacher.objects.create(teacher_name='推播教師', staff_id='EV101', department_id='CS')
+                finally:
+                    connection.close()
+
+            teacher = await sync_to_async(write_elsewhere, thread_sensitive=False)()
+            chunk = (await asyncio.wait_for(anext(chunks), timeout=5)).decode()
+        finally:
+            await chunks.aclose()
+        self.assertIn('event: teacher.created', chunk)
+        self.assertIn(f'"id": {teacher.pk}', chunk)
+        # SSE id 是 outbox 的 id，事件經由資料庫送達而不是寫入行程的 broker
+        outbox_id = await StreamEvent.objects.filter(object_id=teacher.pk, model='teacher').values_list('pk', flat=True).aget()
+        self.assertTrue(chunk.startswith(f'id: {outbox_id}\n'))
+
+class SearchTest(TestCase):
+    """測試姓名與編號搜尋"""
+
+    def setUp(self):
+        self.teacher = Teacher.objects.create(teacher_name="Margaret Chen", staff_id="T100", department_id="CS")
+        self.student = Student.objects.create(
+            student_name="Jonathan Smith", student_id="S2023001", department_id="CS",
+            enroll_year=2023, class_id="CS101", mentor=self.teacher
+        )
+        Student.objects.create(student_name="Jane Doe", student_id="S2023002", department_id="EE", enroll_year=2023, class_id="EE101")
+
+    def test_search_misspelled_name(self):
+        """測試拼錯的姓名仍能找到"""
+        response = self.client.get(reverse('search-list'), {'q': 'Jonathon'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['id'], self.student.pk)
+        self.assertEqual(response.data[0]['kind'], 'student')
+
+    def test_search_identifier_prefix(self):
+        """測試學號前綴比對"""
+        response = self.client.get(reverse('search-list'), {'q': 'S2023', 'kind': 'student'})
+        self.assertEqual([row['identifier'] for row in response.data], ['S2023001', 'S2023002'])
+        self.assertTrue(all(row['match'] == 'identifier' for row in response.data))
+
+    def test_index_follows_update_and_delete(self):
+        """測試更新與刪除後索引同步"""
+        self.teacher.teacher_name = "Margaret Lin"
+        self.teacher.save()
+        response = self.client.get(reverse('search-list'), {'q': 'Lin', 'kind': 'teacher'})
+        self.assertEqual(response.data[0]['name'], 'Margaret Lin')
+        response = self.client.get(reverse('search-list'), {'q': 'Li', 'kind': 'teacher'})
+        self.assertEqual([row['name'] for row in response.data], ['Margaret Lin'])
+
+        self.teacher.delete()
+        response = self.client.get(reverse('search-list'), {'q': 'Margaret', 'kind': 'teacher'})
+        self.assertEqual(response.data, [])
+        response = self.client.get(reverse('search-list'), {'q': 'gr', 'kind': 'teacher'})
+        self.assertEqual(response.data, [])
+
+    def test_short_query_matches_substrings(self):
+        """測試一、兩個字的查詢以 bigram 索引比對子字串，姓名開頭相符的排在前面"""
+        Student.objects.create(student_name="Ajay Rao", student_id="S2023003", department_id="EE", enroll_year=2023, class_id="EE101")
+        response = self.client.get(reverse('search-list'), {'q': 'ja'})
+        self.assertEqual([row['name'] for row in response.data], ['Jane Doe', 'Ajay Rao'])
+
+        response = self.client.get(reverse('search-list'), {'q': 'th'})
+        self.assertEqual([row['name'] for row in response.data], ['Jonathan Smith'])
+
+    def test_chinese_names(self):
+        """測試兩、三個字的中文姓名：部分比對與拼錯一個字"""
+        student = Student.objects.create(student_name="陳小明", student_id="S2023010", department_id="CS", enroll_year=2023, class_id="CS101")
+        teacher = Teacher.objects.create(teacher_name="林美玲", staff_id="T110", department_id="CS")
+        Student.objects.create(student_name="王大同", student_id="S2023011", department_id="CS", enroll_year=2023, class_id="CS101")
+
+        response = self.client.get(reverse('search-list'), {'q': '小明'})
+        self.assertEqual([row['id'] for row in response.data], [student.pk])
+        response = self.client.get(reverse('search-list'), {'q': '美玲', 'kind': 'teacher'})
+        self.assertEqual([row['id'] for row in response.data], [teacher.pk])
+        response = self.client.get(reverse('search-list'), {'q': '明'})
+        self.assertEqual([row['id'] for row in response.data], [student.pk])
+
+        response = self.client.get(reverse('search-list'), {'q': '陳小名'})
+        self.assertEqual([row['id'] for row in response.data], [student.pk])
+        response = self.client.get(reverse('search-list'), {'q': '陳大名'})
+        self.assertEqual(response.data, [])
+
+    def test_fuzzy_match_requires_enough_trigrams(self):
+        """測試模糊比對只回傳命中足夠 trigram 的名字"""
+        response = self.client.get(reverse('search-list'), {'q': 'Jonxxxxxith'})
+        self.assertEqual(response.data, [])
+        response = self.client.get(reverse('search-list'), {'q': 'Jonathn Smth'})
+        self.assertEqual(response.data[0]['id'], self.student.pk)
+
+    def test_search_requires_query(self):
+        """測試缺少 q 參數"""
+        response = self.client.get(reverse('search-list'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ThrottleTest(TestCase):
+    """測試 token bucket 限流"""
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SCHOOL_THROTTLE_RATES={'teacher.list': '2/min'})
+    def test_list_throttled_after_bucket_empty(self):
+        """測試 token 用完後回傳 429"""
+        url = reverse('teacher-list')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        # 其他 action 沒有設定速率，不受影響
+        self.assertEqual(self.client.get(reverse('student-list')).status_code, status.HTTP_200_OK)
+
+    @override_settings(SCHOOL_THROTTLE_RATES={'teacher.list': '1/s'})
+    def test_bucket_refills_over_time(self):
+        """測試 token 依時間補充"""
+        url = reverse('teacher-list')
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1000.0):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1001.5):
+            # 前一秒用掉的額度還剩一半
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1002.0):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    @override_settings(SCHOOL_THROTTLE_RATES={'teacher.list': '1/min'})
+    def test_denied_request_survives_evicted_counter(self):
+        """測試拒絕請求時計數器剛好被淘汰，仍回傳 429 而不是 500"""
+        url = reverse('teacher-list')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        with patch.object(TokenBucketThrottle.cache, 'decr', side_effect=ValueError('evicted')):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(SCHOOL_THROTTLE_RATES={'teacher.list': '5/min'})
+    def test_concurrent_requests_share_the_bucket(self):
+        """測試同一使用者的並行請求不會超過容量"""
+        view = type('View', (), {'basename': 'teacher', 'action': 'list'})()
+        fake_request = type('Request', (), {'user': None, 'META': {'REMOTE_ADDR': '10.0.0.1'}})()
+        barrier = threading.Barrier(20)
+        results = []
+
+        class SlowCache:
+            # 模擬網路上的 cache：讀取有延遲，並行請求的讀寫會交錯
+            def __getattr__(self, name):
+                return getattr(cache, name)
+
+            def get(self, *args, **kwargs):
+                time.sleep(0.01)
+                return cache.get(*args, **kwargs)
+
+        def hit():
+            throttle = TokenBucketThrottle()
+            barrier.wait()
+            results.append(throttle.allow_request(fake_request, view))
+
+        threads = [threading.Thread(target=hit) for _ in range(20)]
+        with patch.object(TokenBucketThrottle, 'cache', SlowCache()):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results.count(True), 5)
+
+    def test_check_rejects_local_cache_with_several_workers(self):
+        """測試多個 worker 搭配行程內 cache 時檢查失敗"""
+        with patch.dict('os.environ', {'WEB_CONCURRENCY': '4'}):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['school.E001'])
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}}):
+                self.assertEqual(check_shared_cache(None), [])
+        with patch.dict('os.environ', {'WEB_CONCURRENCY': '1'}):
+            self.assertEqual(check_shared_cache(None), [])
+
+class SingleFlightTest(TestCase):
+    """測試相同請求合併"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """測試同時進行的相同 key 只執行一次"""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return ['shared']
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('key', compute)))
+        leader.start()
+        started.wait(timeout=5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('key', compute))) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        # 讓 follower 進入等待狀態後才放行 leader
+        time.sleep(0.2)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(timeout=5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['shared']] * 5)
+
+    def test_error_is_shared_and_key_released(self):
+        """測試例外傳遞且之後可以重新執行"""
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do('key', lambda: (_ for _ in ()).throw(ValueError('boom')))
+        self.assertEqual(flight.do('key', lambda: 42), 42)
+
+    def test_shared_flight_merges_across_workers(self):
+        """測試兩個行程（各自的 SharedFlight）同時請求時只有一個執行，另一個讀取共用 cache 的結果"""
+        cache.clear()
+        worker_a, worker_b = SharedFlight('test:flight'), SharedFlight('test:flight')
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute(name):
+            calls.append(name)
+            started.set()
+            release.wait(timeout=5)
+            return [name]
+
+        results = {}
+        leader = threading.Thread(target=lambda: results.setdefault('a', worker_a.do('key', lambda: compute('a'))))
+        leader.start()
+        started.wait(timeout=5)
+        follower = threading.Thread(target=lambda: results.setdefault('b', worker_b.do('key', lambda: compute('b'))))
+        follower.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in (leader, follower):
+            thread.join(timeout=5)
+
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(results, {'a': ['a'], 'b': ['a']})
+        # lock 已釋放，之後的請求重新執行
+        self.assertEqual(worker_b.do('key', lambda: ['fresh']), ['fresh'])
+
+    def test_teacher_list_waits_for_another_worker(self):
+        """測試老師列表在其他 worker 正在查詢時直接使用它的結果，不查資料庫"""
+        cache.clear()
+        lock_key, result_key = teacher_list_flight.keys('/api/teachers', 'other-worker')
+        cache.set(lock_key, 'other-worker')
+        cache.set(result_key, [{'teacher_name': 'from another worker'}])
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('teacher-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'teacher_name': 'from another worker'}])
+
+class TokenAuthenticationTest(TestCase):
+    """測試快取的 Token 認證"""
+
+    def setUp(self):
+        token_cache.clear()
+        cache.clear()
+        self.user = User.objects.create_user(username='tokenuser', password='x')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_lookup_skips_queries(self):
+        """測試第二次請求不再查詢 token 與使用者"""
+        url = reverse('search-list')
+        self.client.get(url, {'q': 'x'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'q': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('authtoken_token' in query['sql'] for query in queries.captured_queries))
+
+    def test_revoked_token_is_rejected(self):
+        """測試刪除 token 後立即失效"""
+        url = reverse('teacher-list')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.token.delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """測試停用使用者後快取被清除"""
+        url = reverse('teacher-list')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_each_request_gets_a_fresh_user(self):
+        """測試快取命中時每次都重建使用者，實例狀態不會跨請求共用"""
+        authentication = CachedTokenAuthentication()
+        first, _ = authentication.authenticate_credentials(self.token.key)
+        first._perm_cache = {'school.stale'}
+        with CaptureQueriesContext(connection) as queries:
+            second, token = authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(len(queries.captured_queries), 0)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.pk, self.user.pk)
+        self.assertFalse(hasattr(second, '_perm_cache'))
+        self.assertIs(token.user, second)
+
+    def test_revocation_reaches_other_workers(self):
+        """測試其他 worker 仍持有的快取在 token 刪除或權限異動後失效"""
+        url = reverse('teacher-list')
+        self.client.get(url)
+        stale = token_cache.get(self.token.key)
+
+        self.user.user_permissions.add(Permission.objects.get(codename='view_teacher'))
+        token_cache.set(self.token.key, stale)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertTrue(any('authtoken_token' in query['sql'] for query in queries.captured_queries))
+
+        stale = token_cache.get(self.token.key)
+        self.token.delete()
+        token_cache.set(self.token.key, stale)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+class LRUCacheTest(TestCase):
+    """測試 LRU/TTL 快取"""
+
+    def test_evicts_least_recently_used(self):
+        """測試超過容量時淘汰最久未使用的項目"""
+        lru = LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+
+    def test_expires_after_ttl(self):
+        """測試超過 TTL 的項目失效"""
+        now = [100.0]
+        lru = LRUCache(ttl=10, timer=lambda: now[0])
+        lru.set('a', 1)
+        now[0] = 111.0
+        self.assertIsNone(lru.get('a'))
+
+class JobTest(APITestCase):
+    """測試背景批次工作"""
+
+    def setUp(self):
+        self.teacher = Teacher.objects.create(teacher_name="工作教師", staff_id="JT001", department_id="CS")
+
+    def student_row(self, index, **extra):
+        return dict({
+            'student_name': f'批次學生{index}',
+            'student_id': f'JOB{index:04d}',
+            'department_id': 'CS',
+            'enroll_year': 2024,
+            'class_id': 'CS101',
+            'mentor_id': self.teacher.pk,
+        }, **extra)
+
+    @override_settings(SCHOOL_JOBS={'ASYNC_THRESHOLD': 2, 'BATCH_SIZE': 2})
+    def test_large_list_post_returns_202_and_runs_in_batches(self):
+        """測試大量建立學生時回傳 202 並分批處理"""
+        rows = [self.student_row(i) for i in range(5)]
+        rows[3]['student_id'] = rows[0]['student_id']  # 與第一列重複
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(reverse('student-list'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Student.objects.count(), 0)
+
+        job_id = response.data['id']
+        run_job(job_id)
+
+        response = self.client.get(reverse('job-detail', kwargs={'pk': job_id}))
+        self.assertEqual(response.data['status'], JobStatus.SUCCEEDED)
+        self.assertEqual((response.data['processed'], response.data['succeeded'], response.data['failed']), (5, 4, 1))
+        self.assertEqual(response.data['results'][3]['status'], 'error')
+        self.assertIn('student_id', response.data['results'][3]['errors'])
+        self.assertEqual(Student.objects.count(), 4)
+
+    def test_bulk_update_reassigns_mentor(self):
+        """測試批次更新（重新指派導師）"""
+        other = Teacher.objects.create(teacher_name="新導師", staff_id="JT002", department_id="CS")
+        student = Student.objects.create(**{k: v for k, v in self.student_row(1).items() if k != 'mentor_id'}, mentor=self.teacher)
+        response = self.client.post(reverse('job-list'), {
+            'kind': JobKind.STUDENT_UPDATE,
+            'rows': [{'id': student.pk, 'mentor_id': other.pk}, {'id': 999999, 'mentor_id': other.pk}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        job = run_job(response.data['id'])
+        student.refresh_from_db()
+        self.assertEqual(student.mentor, other)
+        self.assertEqual([result.status for result in job.results.all()], ['updated', 'error'])
+
+    def test_requeues_only_stale_running_jobs(self):
+        """測試 run_jobs 只重新排入逾時的 running 工作，仍有 heartbeat 的工作不受影響"""
+        now = timezone.now()
+        live = Job.objects.create(
+            kind=JobKind.STUDENT_CREATE, payload=[self.student_row(1)], total=1,
+            status=JobStatus.RUNNING, owner='pod-a', heartbeat_at=now,
+        )
+        stale = Job.objects.create(
+            kind=JobKind.STUDENT_CREATE, payload=[self.student_row(2)], total=1,
+            status=JobStatus.RUNNING, owner='pod-b', heartbeat_at=now - timedelta(minutes=10),
+        )
+        out = StringIO()
+        call_command('run_jobs', stdout=out)
+        self.assertIn('Requeued 1 stale job(s).', out.getvalue())
+
+        live.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((live.status, live.owner), (JobStatus.RUNNING, 'pod-a'))
+        self.assertEqual(stale.status, JobStatus.SUCCEEDED)
+        self.assertEqual(list(Student.objects.values_list('student_id', flat=True)), ['JOB0002'])
+
+    def test_runner_stops_after_losing_the_job(self):
+        """測試工作被其他 runner 接手後，原 runner 的批次 rollback 且不覆寫狀態"""
+        job = enqueue(JobKind.STUDENT_CREATE, [self.student_row(1), self.student_row(2)])
+        get = Job.objects.get
+
+        def taken_over(**kwargs):
+            # 模擬在取得工作後被判定逾時，並由另一個 pod 重新取得
+            Job.objects.filter(**kwargs).update(owner='pod-b', heartbeat_at=timezone.now())
+            return get(**kwargs)
+
+        with patch.object(Job.objects, 'get', side_effect=taken_over), self.assertLogs('school.jobs', 'WARNING'):
+            self.assertIsNone(run_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.owner, job.processed), (JobStatus.RUNNING, 'pod-b', 0))
+        self.assertFalse(job.results.exists())
+        self.assertEqual(Student.objects.count(), 0)
+
+    def test_rejects_unknown_kind(self):
+        """測試不支援的工作類型"""
+        response = self.client.post(reverse('job-list'), {'kind': 'student.drop', 'rows': [{}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class DeploymentProfileTest(TestCase):
+    """測試 API-only 部署設定"""
+
+    def test_api_profile_drops_admin_and_sessions(self):
+        """測試 API profile 移除 admin/sessions 與對應的中介層"""
+        from mysite import settings_api
+
+        self.assertNotIn('django.contrib.admin', settings_api.INSTALLED_APPS)
+        self.assertNotIn('django.contrib.sessions', settings_api.INSTALLED_APPS)
+        self.assertIn('rest_framework.authtoken', settings_api.INSTALLED_APPS)
+        self.assertNotIn('django.contrib.sessions.middleware.SessionMiddleware', settings_api.MIDDLEWARE)
+        self.assertEqual(
+            settings_api.REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'],
+            ['school.authentication.CachedTokenAuthentication'],
+        )
+
+    def test_warm_up_loads_urlconf(self):
+        """測試 warm_up 預先載入 URLconf"""
+        from mysite.warmup import warm_up
+
+        warm_up()
+        self.assertEqual(reverse('teacher-list'), '/api/teachers')
+
+    def test_viewsets_are_imported_on_first_request(self):
+        """測試 URLconf 中的 viewset 在第一次請求前不會被載入"""
+        view = LazyView('school.views.GraphViewSet', {'get': 'list'}, basename='graph')
+        self.assertFalse(hasattr(view, 'view_class'))
+        self.assertIsNone(view._view)
+        self.assertEqual(view.cls.__name__, 'GraphViewSet')
+        self.assertEqual(view.actions, {'get': 'list'})
+        self.assertIsInstance(resolve('/api/graph').func, LazyView)
+
+        # 測試程序早已載入 school.views，需在新的程序中確認載入 URLconf 不會 import 它
+        script = (
+            'import sys, django\n'
+            'django.setup()\n'
+            'from django.urls import get_resolver\n'
+            'get_resolver().url_patterns\n'
+            "print('school.views' in sys.modules)\n"
+        )
+        for settings_module in ('mysite.settings', 'mysite.settings_api'):
+            with self.subTest(settings=settings_module):
+                result = subprocess.run(
+                    [sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                    env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}, check=True,
+                )
+                self.assertEqual(result.stdout.strip(), 'False')
+
+class GraphTest(BaseTestCase):
+    """測試師生關係圖"""
+
+    def setUp(self):
+        super().setUp()
+        self.teacher3 = Teacher.objects.create(teacher_name="test_teacher3", staff_id="T003", department_id="CS")
+        self.student2 = Student.objects.create(
+            student_name="test_student2", student_id="S002", department_id="EE",
+            enroll_year=2023, class_id="EE101", mentor=self.teacher1, advisor=self.teacher3
+        )
+
+    def test_student_seed_expands_to_other_mentees(self):
+        """測試由學生出發取得導師的其他學生，查詢次數固定"""
+        with self.assertNumQueries(3):
+            graph = build_graph(student_ids=[self.student1.pk])
+        self.assertEqual(set(graph['students']), {self.student1.pk, self.student2.pk})
+        self.assertEqual(set(graph['teachers']), {self.teacher1.pk, self.teacher2.pk, self.teacher3.pk})
+        self.assertIn([self.student2.pk, self.teacher1.pk], graph['edges']['mentor'])
+        self.assertIn([self.student2.pk, self.teacher3.pk], graph['edges']['advisor'])
+        self.assertNotIn('mentor_id', graph['students'][self.student1.pk])
+
+    def test_department_endpoint(self):
+        """測試依系所查詢的 API"""
+        response = self.client.get(reverse('graph-list'), {'department_id': 'EE'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['students']), {self.student1.pk, self.student2.pk})
+        self.assertEqual(response.data['teachers'][self.teacher2.pk]['staff_id'], 'T002')
+
+    def test_requires_a_seed(self):
+        """測試沒有任何起點時回傳 400"""
+        self.assertEqual(self.client.get(reverse('graph-list')).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('graph-list'), {'teacher_ids': 'a'}).status_code, status.HTTP_400_BAD_REQUEST)
+        for ids in ('99999999999999999999999', '-1', '0'):
+            response = self.client.get(reverse('graph-list'), {'teacher_ids': ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, ids)
+
+class TeacherSummaryCacheTest(BaseTestCase):
+    """測試 StudentSerializer 使用的老師摘要快取"""
+
+    def setUp(self):
+        super().setUp()
+        teacher_summaries.local.clear()
+        cache.clear()
+
+    def test_summary_matches_simple_serializer(self):
+        """測試快取內容與 TeacherSimpleSerializer 一致"""
+        self.assertEqual(teacher_summaries.get(self.teacher1.pk), TeacherSimpleSerializer(self.teacher1).data)
+
+    def test_student_list_loads_teachers_once(self):
+        """測試學生列表只需一次查詢載入老師，之後直接命中快取"""
+        url = reverse('student-list')
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data[0]['mentor']['teacher_name'], 'test_teacher1')
+
+    def test_teacher_update_invalidates_summary(self):
+        """測試老師更新後學生看到新的資料"""
+        url = reverse('student-detail', kwargs={'pk': self.student1.pk})
+        self.client.get(url)
+        self.client.patch(reverse('teacher-detail', kwargs={'pk': self.teacher1.pk}), {'teacher_name': '改名教師'}, format='json')
+        response = self.client.get(url)
+        self.assertEqual(response.data['mentor']['teacher_name'], '改名教師')
+
+class OptimisticConcurrencyTest(BaseTestCase):
+    """測試 If-Match 樂觀鎖"""
+
+    def test_retrieve_returns_etag(self):
+        """測試取得學生時帶 ETag"""
+        response = self.client.get(reverse('student-detail', kwargs={'pk': self.student1.pk}))
+        self.assertEqual(response['ETag'], '"1"')
+        self.assertEqual(response.data['version'], 1)
+
+    def test_stale_if_match_returns_412(self):
+        """測試版本過期的更新回傳 412 且資料不變"""
+        url = reverse('student-detail', kwargs={'pk': self.student1.pk})
+        response = self.client.patch(url, {'class_id': 'CS201'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"2"')
+
+        response = self.client.patch(url, {'class_id': 'CS301'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.student1.refresh_from_db()
+        self.assertEqual((self.student1.class_id, self.student1.version), ('CS201', 2))
+
+    def test_stale_instance_save_raises(self):
+        """測試以過期的物件儲存會拋出 VersionConflict"""
+        stale = Teacher.objects.get(pk=self.teacher1.pk)
+        self.teacher1.teacher_name = '先更新'
+        self.teacher1.save()
+        stale.teacher_name = '後更新'
+        with self.assertRaises(VersionConflict):
+            stale.save()
+        self.assertEqual(stale.version, 1)
+
+    def test_bulk_update_reports_conflicts(self):
+        """測試批次更新回報每一列的版本衝突"""
+        job = enqueue(JobKind.STUDENT_UPDATE, [
+            {'id': self.student1.pk, 'version': 1, 'class_id': 'CS201'},
+            {'id': self.student1.pk, 'version': 1, 'class_id': 'CS301'},
+        ])
+        job = run_job(job.pk)
+        self.assertEqual([result.status for result in job.results.all()], ['updated', 'conflict'])
+        self.assertEqual(job.failed, 1)
+        self.student1.refresh_from_db()
+        self.assertEqual(self.student1.class_id, 'CS201')
+
+class BatchTest(BaseTestCase):
+    """測試 /api/batch 複合請求"""
+
+    def setUp(self):
+        super().setUp()
+        teacher_summaries.local.clear()
+        cache.clear()
+
+    def test_runs_subrequests_with_identity_map(self):
+        """測試子請求依序執行，重複的老師只載入一次"""
+        teacher_url = f'/api/teachers/{self.teacher1.pk}'
+        payload = {'requests': [
+            {'method': 'GET', 'path': f'/api/students/{self.student1.pk}'},
+            {'method': 'GET', 'path': teacher_url},
+            {'method': 'GET', 'path': teacher_url},
+            {'method': 'GET', 'path': '/api/students/99999'},
+            {'method': 'GET', 'path': '/api/nowhere'},
+        ]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('batch-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in response.data], [200, 200, 200, 404, 404])
+        self.assertEqual(response.data[0]['body']['mentor']['teacher_name'], 'test_teacher1')
+        self.assertEqual(response.data[1]['headers']['ETag'], '"1"')
+        self.assertEqual(response.data[2]['body']['staff_id'], 'T001')
+        teacher_queries = [query for query in queries.captured_queries if 'FROM "teacher_list"' in query['sql']]
+        # 學生的 mentor/advisor 摘要一次 + 老師本身一次
+        self.assertEqual(len(teacher_queries), 2)
+
+    def test_writes_share_user_and_refresh_identity(self):
+        """測試子請求共用使用者，寫入後再讀取拿到新資料"""
+        self.client.force_authenticate(user=self.user)
+        url = f'/api/students/{self.student1.pk}'
+        payload = {'requests': [
+            {'method': 'GET', 'path': url},
+            {'method': 'PATCH', 'path': url, 'body': {'class_id': 'CS999'}, 'headers': {'If-Match': '"1"'}},
+            {'method': 'PATCH', 'path': url, 'body': {'class_id': 'CS000'}, 'headers': {'If-Match': '"1"'}},
+            {'method': 'GET', 'path': url},
+        ]}
+        response = self.client.post(reverse('batch-list'), payload, format='json')
+        self.assertEqual([item['status'] for item in response.data], [200, 200, 412, 200])
+        self.assertEqual(response.data[3]['body']['class_id'], 'CS999')
+
+    def test_write_refreshes_related_objects(self):
+        """測試修改學生的導師後，同一批次再讀老師會看到新的 mentees"""
+        self.client.force_authenticate(user=self.user)
+        teacher_url = f'/api/teachers/{self.teacher2.pk}'
+        payload = {'requests': [
+            {'method': 'GET', 'path': teacher_url},
+            {'method': 'PATCH', 'path': f'/api/students/{self.student1.pk}', 'body': {'mentor_id': self.teacher2.pk}},
+            {'method': 'GET', 'path': teacher_url},
+        ]}
+        response = self.client.post(reverse('batch-list'), payload, format='json')
+        self.assertEqual([item['status'] for item in response.data], [200, 200, 200])
+        self.assertEqual(response.data[0]['body']['mentees'], [])
+        self.assertEqual([row['id'] for row in response.data[2]['body']['mentees']], [self.student1.pk])
+
+    @override_settings(SCHOOL_BATCH_MAX_REQUESTS=2)
+    def test_enforces_limits(self):
+        """測試子請求數量上限與禁止巢狀 batch"""
+        item = {'method': 'GET', 'path': '/api/teachers'}
+        response = self.client.post(reverse('batch-list'), {'requests': [item] * 3}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(reverse('batch-list'), {'requests': [{'method': 'POST', 'path': '/api/batch'}]}, format='json')
+        self.assertEqual(response.data[0]['status'], status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(reverse('batch-list'), {'requests': [dict(item, headers={'Authorization': 'Token x'})]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MessagePackTest(BaseTestCase):
+    """MessagePack 回應/請求格式測試"""
+
+    def test_round_trip_matches_json(self):
+        """測試 MessagePack 回應與 JSON 內容一致"""
+        url = reverse('student-detail', kwargs={'pk': self.student1.pk})
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(data, self.client.get(url, format='json').json())
+        self.assertEqual(data['role'], Role.STUDENT)
+        self.assertIsInstance(data['created_at'], str)
+
+    def test_columnar_list(self):
+        """測試 layout=columnar 的列表只帶一次欄位名稱"""
+        response = self.client.get(reverse('teacher-list'), HTTP_ACCEPT='application/msgpack; layout=columnar')
+        data = msgpack.unpackb(response.content)
+        self.assertIn('layout=columnar', response['Content-Type'])
+        self.assertEqual(len(data['rows']), Teacher.objects.count())
+        row = dict(zip(data['columns'], data['rows'][0]))
+        self.assertEqual(row['title'], Title.PROFESSOR)
+
+    def test_bulk_create_with_columnar_body(self):
+        """測試以 columnar MessagePack 批次新增老師"""
+        body = msgpack.packb({
+            'columns': ['teacher_name', 'staff_id', 'title', 'department_id'],
+            'rows': [['mp_teacher1', 'M001', Title.LECTURER, 'CS'], ['mp_teacher2', 'M002', Title.LECTURER, 'CS']],
+        })
+        response = self.client.post(
+            reverse('teacher-list'), body,
+            content_type='application/msgpack; layout=columnar', HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['staff_id'] for row in msgpack.unpackb(response.content)], ['M001', 'M002'])
+
+        response = self.client.post(reverse('teacher-list'), b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_columnar_body(self):
+        """測試格式錯誤的 columnar 內容回傳 400 而不是 500"""
+        for payload in (
+            {'columns': ['teacher_name'], 'rows': [1]},
+            {'columns': ['teacher_name', 'staff_id'], 'rows': [['only_name']]},
+            {'columns': [['teacher_name']], 'rows': [['x']]},
+            {'columns': ['teacher_name', 'teacher_name'], 'rows': [['x', 'y']]},
+        ):
+            response = self.client.post(
+                reverse('teacher-list'), msgpack.packb(payload), content_type='application/msgpack; layout=columnar',
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, payload)
+
+    def test_gzip_when_accepted(self):
+        """測試用戶端接受 gzip 時壓縮回應"""
+        for index in range(20):
+            Student.objects.create(
+                student_name=f'gzip_student{index}', student_id=f'G{index:03d}',
+                department_id='CS', class_id='CS101', enroll_year=2024,
+            )
+        response = self.client.get(reverse('student-list'), HTTP_ACCEPT='application/msgpack', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class ArchiveTest(BaseTestCase):
+    """畢業學生封存測試"""
+
+    def setUp(self):
+        super().setUp()
+        self.graduates = [
+            Student.objects.create(
+                student_name=f'graduate{index}', student_id=f'A{index:03d}',
+                department_id='CS', class_id='CS101', enroll_year=current_school_year() - 10,
+                mentor=self.teacher1, advisor=self.teacher2,
+            )
+            for index in range(3)
+        ]
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_graduates', *args, stdout=out)
+        return out.getvalue()
+
+    def test_moves_graduates_in_batches(self):
+        """測試分批搬移並保留導師/指導老師資料"""
+        self.assertIn('3 student(s)', self.archive('--grade', '8', '--dry-run'))
+        self.assertEqual(ArchivedStudent.objects.count(), 0)
+
+        self.assertIn('Archived 3', self.archive('--grade', '8', '--batch-size', '2'))
+        self.assertFalse(Student.objects.filter(student_id__startswith='A').exists())
+        self.assertTrue(Student.objects.filter(pk=self.student1.pk).exists())
+
+        archived = ArchivedStudent.objects.get(student_pk=self.graduates[0].pk)
+        self.assertEqual(archived.mentor_snapshot['teacher_name'], self.teacher1.teacher_name)
+        teacher_pk = self.teacher1.pk
+        self.teacher1.delete()
+        archived.refresh_from_db()
+        self.assertIsNone(archived.mentor_id)
+        self.assertEqual(archived.mentor_snapshot['id'], teacher_pk)
+
+    def test_reused_student_id_is_archived_again(self):
+        """測試學號被新生沿用後，再次封存不會失敗"""
+        self.archive('--grade', '8')
+        Student.objects.create(
+            student_name='reused', student_id='A000',
+            department_id='CS', class_id='CS101', enroll_year=current_school_year() - 10,
+        )
+        self.assertIn('Archived 1', self.archive('--grade', '8'))
+        self.assertEqual(ArchivedStudent.objects.filter(student_id='A000').count(), 2)
+
+    def test_list_includes_archived_only_on_request(self):
+        """測試預設列表只回傳在學學生，include_archived=1 才附上封存資料"""
+        self.archive('--grade', '8')
+        response = self.client.get(reverse('student-list'))
+        self.assertEqual([row['id'] for row in response.data], [self.student1.pk])
+
+        response = self.client.get(reverse('student-list'), {'include_archived': '1'})
+        archived = [row for row in response.data if row.get('archived')]
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual({row['id'] for row in archived}, {student.pk for student in self.graduates})
+        self.assertEqual(archived[0]['advisor']['id'], self.teacher2.pk)
+
+        response = self.client.get(reverse('search-list'), {'q': 'graduate'})
+        self.assertEqual(response.data, [])
+
+    @override_settings(SCHOOL_ARCHIVE={'PAGE_SIZE': 2})
+    def test_archived_part_is_paged(self):
+        """測試封存資料依 student_pk 分頁，下一頁由 Link header 提供"""
+        self.archive('--grade', '8')
+        response = self.client.get(reverse('student-list'), {'include_archived': '1', 'archived_limit': '50'})
+        archived = [row['id'] for row in response.data if row.get('archived')]
+        self.assertEqual(archived, [student.pk for student in self.graduates[:2]])
+        self.assertIn(f'archived_after={self.graduates[1].pk}', response['Link'])
+        self.assertTrue(response['Link'].endswith('rel="next"'))
+
+        response = self.client.get(response['Link'][1:response['Link'].index('>')])
+        archived = [row['id'] for row in response.data if row.get('archived')]
+        self.assertEqual(archived, [self.graduates[2].pk])
+        self.assertNotIn('Link', response)
+
+        response = self.client.get(reverse('student-list'), {'include_archived': '1', 'archived_after': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_archived_only_on_request(self):
+        """測試已封存學生的 id 只有帶 include_archived=1 才查得到"""
+        self.archive('--grade', '8')
+        url = reverse('student-detail', kwargs={'pk': self.graduates[0].pk})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(url, {'include_archived': '1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.graduates[0].pk)
+        self.assertTrue(response.data['archived'])
+
+        response = self.client.get(reverse('student-detail', kwargs={'pk': self.student1.pk}), {'include_archived': '1'})
+        self.assertNotIn('archived', response.data)
+        missing = reverse('student-detail', kwargs={'pk': 999999})
+        self.assertEqual(self.client.get(missing, {'include_archived': '1'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_columnar_keeps_archived_flag(self):
+        """測試 columnar 格式包含封存學生才有的欄位"""
+        self.archive('--grade', '8')
+        response = self.client.get(
+            reverse('student-list'), {'include_archived': '1'},
+            HTTP_ACCEPT='application/msgpack; layout=columnar',
+        )
+        data = msgpack.unpackb(response.content)
+        rows = [dict(zip(data['columns'], row)) for row in data['rows']]
+        self.assertEqual([row['archived'] for row in rows], [None, True, True, True])
+        self.assertIn('archived_at', data['columns'])
+
+
+@override_settings(SCHOOL_SLOW_QUERY_LOG={'THRESHOLD_MS': 0, 'SIZE': 50, 'CACHE': 'default'})
+class SlowQueryLogTest(BaseTestCase):
+    """慢查詢紀錄測試"""
+
+    def setUp(self):
+        super().setUp()
+        slow_query_log.clear()
+
+    def test_normalize_sql(self):
+        """測試只有參數不同的查詢得到相同形狀"""
+        first = normalize_sql('SELECT * FROM "student_list" WHERE "id" IN (%s, %s) LIMIT 21')
+        second = normalize_sql("SELECT *  FROM \"student_list\" WHERE \"id\" IN (%s) LIMIT 5")
+        self.assertEqual(first, second)
+        self.assertEqual(first, 'SELECT * FROM "student_list" WHERE "id" IN (...) LIMIT ?')
+
+    def test_ring_buffer_is_bounded(self):
+        """測試環狀緩衝區只保留最新的紀錄"""
+        log = SlowQueryLog(alias='default', size=3)
+        log.clear()
+        for index in range(5):
+            log.append({'index': index})
+        self.assertEqual([entry['index'] for entry in log.entries()], [2, 3, 4])
+
+    def test_records_view_action_and_plan(self):
+        """測試記錄來源 view/action、參數與 EXPLAIN 結果，並可用指令彙總"""
+        self.client.get(reverse('student-list'))
+        self.client.get(reverse('student-detail', kwargs={'pk': self.student1.pk}))
+
+        entries = slow_query_log.entries()
+        detail = [entry for entry in entries if entry['action'] == 'retrieve' and 'student_list' in entry['sql']]
+        self.assertTrue(detail)
+        self.assertEqual(detail[0]['view'], 'StudentViewSet')
+        self.assertIn(self.student1.pk, detail[0]['params'])
+        self.assertTrue(detail[0]['plan'])
+        self.assertIn('StudentViewSet.list', set().union(*(group['views'] for group in aggregate(entries))))
+
+        out = StringIO()
+        call_command('slow_queries', '--view', 'StudentViewSet.retrieve', stdout=out)
+        self.assertIn(detail[0]['fingerprint'], out.getvalue())
+
+        out = StringIO()
+        call_command('slow_queries', '--show', detail[0]['fingerprint'], stdout=out)
+        self.assertIn(detail[0]['plan'][0], out.getvalue())
+
+    def test_records_failed_queries_with_error(self):
+        """測試執行失敗的查詢也會記錄耗時與錯誤，且例外照常拋出"""
+        execute = CursorWrapper._execute
+
+        def locked(cursor, sql, params, *ignored_wrapper_args):
+            if 'FROM "student_list"' in sql:
+                raise OperationalError('database is locked')
+            return execute(cursor, sql, params, *ignored_wrapper_args)
+
+        with patch.object(CursorWrapper, '_execute', locked), self.assertRaises(OperationalError):
+            self.client.get(reverse('student-detail', kwargs={'pk': self.student1.pk}))
+
+        failed = [entry for entry in slow_query_log.entries() if entry['error']]
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(failed[0]['error'], 'OperationalError: database is locked')
+        self.assertEqual((failed[0]['view'], failed[0]['action']), ('StudentViewSet', 'retrieve'))
+        self.assertIsNone(failed[0]['plan'])
+
+        out = StringIO()
+        call_command('slow_queries', '--show', failed[0]['fingerprint'], stdout=out)
+        self.assertIn('database is locked', out.getvalue())
+
+    def test_batch_subrequests_keep_their_own_origin(self):
+        """測試 batch 子請求的查詢記在子請求的 view/action 與路徑下"""
+        path = f'/api/students/{self.student1.pk}'
+        payload = {'requests': [{'method': 'GET', 'path': path}]}
+        self.client.post(reverse('batch-list'), payload, format='json')
+
+        entries = [entry for entry in slow_query_log.entries() if 'FROM "student_list"' in entry['sql']]
+        self.assertTrue(entries)
+        for entry in entries:
+            self.assertEqual((entry['view'], entry['action']), ('StudentViewSet', 'retrieve'))
+            self.assertEqual((entry['method'], entry['path']), ('GET', path))
@@ -0,0 +1,94 @@
+# school/throttling.py
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'60/min' -> (60, 1.0)：桶子容量與每秒補充的 token 數"""
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    對每個使用者（未登入則以 IP）限流，狀態存在共用的 Django cache
+    速率依 viewset action 設定於 settings.SCHOOL_THROTTLE_RATES，例如 {'teacher.list': '60/min'}
+    沒有設定速率的 action 不限流
+
+    效果等同容量為 capacity、每秒補充 refill 的 token bucket，但以兩個長度為 capacity / refill 的
+    時間窗計數器近似（前一窗依經過比例遞減），只用 cache.add/incr/decr，
+    同一個使用者的並行請求各自拿到不同的計數，不會因為同時讀到相同的 token 數而一起通過
+    """
+    cache = cache
+    timer = time.time
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def get_scope(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        basename = getattr(view, 'basename', None)
+        action = getattr(view, 'action', None)
+        if basename and action:
+            return f'{basename}.{action}'
+        return None
+
+    def get_rate(self, scope):
+        return getattr(settings, 'SCHOOL_THROTTLE_RATES', {}).get(scope)
+
+    def get_cache_key(self, request, scope):
+        if request.user and request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        scope = self.get_scope(view)
+        rate = self.get_rate(scope) if scope else None
+        if rate is None:
+            return True
+
+        capacity, refill = parse_rate(rate)
+        window = capacity / refill
+        now = self.timer()
+        index = int(now // window)
+        elapsed = now - index * window
+        key = self.get_cache_key(request, scope)
+        current_key = f'{key}:{index}'
+
+        # 計數器保留兩個時間窗，下一窗還要用來計算前一窗的剩餘量
+        self.cache.add(current_key, 0, int(window * 2) + 1)
+        try:
+            count = self.cache.incr(current_key)
+        except ValueError:
+            # 計數器剛好被 cache 淘汰
+            self.cache.add(current_key, 1, int(window * 2) + 1)
+            count = 1
+        previous = self.cache.get(f'{key}:{index - 1}', 0) * (1 - elapsed / window)
+        if previous + count <= capacity:
+            return True
+
+        # 被拒絕的請求不佔用額度
+        try:
+            self.cache.decr(current_key)
+        except ValueError:
+            # 計數器剛好被 cache 淘汰，沒有額度需要歸還
+            pass
+        if count > capacity or not previous:
+            self.wait_time = window - elapsed
+        else:
+            # 前一窗的份量隨時間遞減，等到剛好多出一個名額
+            self.wait_time = (previous + count - capacity) / (previous / (window - elapsed))
+        return False
+
+    def wait(self):
+        return self.wait_time
@@ -0,0 +1,28 @@
+# school/urls.py
+
+from django.urls import path
+from rest_framework.routers import APIRootView
+from rest_framework.urlpatterns import format_suffix_patterns
+
+from .routing import DETAIL_ACTIONS, LIST_ACTIONS, viewset_urls
+from .stream import event_stream
+
+# (prefix, viewset, basename, list actions, detail actions)
+# viewset 以字串指定，第一次收到該路由的請求時才匯入
+VIEWSETS = [
+    ('teachers', 'school.views.TeacherViewSet', 'teacher', LIST_ACTIONS, DETAIL_ACTIONS),
+    ('students', 'school.views.StudentViewSet', 'student', LIST_ACTIONS, DETAIL_ACTIONS),
+    ('search', 'school.views.SearchViewSet', 'search', {'get': 'list'}, None),
+    ('jobs', 'school.views.JobViewSet', 'job', LIST_ACTIONS, {'get': 'retrieve'}),
+    ('graph', 'school.views.GraphViewSet', 'graph', {'get': 'list'}, None),
+    ('batch', 'school.views.BatchViewSet', 'batch', {'post': 'create'}, None),
+]
+
+urlpatterns = [
+    path('', APIRootView.as_view(api_root_dict={prefix: f'{basename}-list' for prefix, _, basename, _, _ in VIEWSETS}), name='api-root'),
+]
+for prefix, dotted_path, basename, list_actions, detail_actions in VIEWSETS:
+    urlpatterns += viewset_urls(prefix, dotted_path, basename, list_actions, detail_actions)
+urlpatterns = format_suffix_patterns(urlpatterns)
+
+urlpatterns.append(path('stream', event_stream, name='event-stream'))
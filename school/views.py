@@ -1,16 +1,61 @@
 # school/views.py
-from rest_framework import viewsets, status
+from django.http import Http404
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from rest_framework import mixins, viewsets, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from .models import Teacher, Student
-from .serializers import TeacherSerializer, TeacherSimpleSerializer, StudentSerializer, StudentSimpleSerializer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from .archive import archive_option
+from .batch import run_batch
+from .coalescing import SharedFlight
+from .concurrency import OptimisticConcurrencyMixin
+from .graph import build_graph
+from .identity import IdentityMapMixin
+from .jobs import enqueue, job_option
+from .search import KINDS, search_people
+from .models import Teacher, Student, ArchivedStudent, Job, JobKind
+from .renderers import MessagePackParser, MessagePackRenderer
+from .serializers import (
+    TeacherSerializer, TeacherSimpleSerializer, StudentSerializer, StudentSimpleSerializer, ArchivedStudentSerializer,
+    JobSerializer, JobDetailSerializer, JobCreateSerializer, BatchSerializer,
+)
+
+teacher_list_flight = SharedFlight('school:flight:teacher-list')
+
+def accept_job(request, kind, rows):
+    """建立背景工作並立即回傳 202，進度可由 /api/jobs/{id} 查詢"""
+    job = enqueue(kind, rows, user=request.user)
+    location = reverse('job-detail', kwargs={'pk': job.pk})
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+
+def is_bulk(data):
+    return isinstance(data, list) and len(data) > job_option('ASYNC_THRESHOLD', 1000)
 
 # Create your views here.
-class TeacherViewSet(viewsets.ModelViewSet):
-    queryset = Teacher.objects.all()
+# 大量資料的用戶端可用 Accept: application/msgpack（可加 layout=columnar），並以 gzip 壓縮回應
+@method_decorator(gzip_page, name='dispatch')
+class TeacherViewSet(IdentityMapMixin, OptimisticConcurrencyMixin, viewsets.ModelViewSet):
+    queryset = Teacher.objects.prefetch_related('mentees', 'advisees')
     serializer_class = TeacherSerializer
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
+
+    def list(self, request, *args, **kwargs):
+        # 同時間相同的查詢只做一次資料庫查詢與序列化，跨 worker 時透過共用 cache 合併
+        data = teacher_list_flight.do(
+            request.get_full_path(),
+            lambda: super(TeacherViewSet, self).list(request, *args, **kwargs).data,
+        )
+        return Response(data)
 
     def create(self, request, *args, **kwargs):
         is_many = isinstance(request.data, list)
+        if is_bulk(request.data):
+            return accept_job(request, JobKind.TEACHER_CREATE, request.data)
         
         serializer = self.get_serializer(data=request.data, many=is_many)
         serializer.is_valid(raise_exception=True)
@@ -18,15 +63,139 @@ class TeacherViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class StudentViewSet(viewsets.ModelViewSet):
+@method_decorator(gzip_page, name='dispatch')
+class StudentViewSet(IdentityMapMixin, OptimisticConcurrencyMixin, viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
+
+    def include_archived(self):
+        # 只有明確要求時才查封存表，預設查詢只碰 student_list
+        return self.request.query_params.get('include_archived') in ('1', 'true')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if self.include_archived():
+            # 封存表只增不減，依 student_pk 分頁，下一頁以 Link: rel="next" 提供
+            page_size = archive_option('PAGE_SIZE', 100)
+            try:
+                after = int(request.query_params.get('archived_after', 0))
+                limit = min(max(int(request.query_params.get('archived_limit', page_size)), 1), page_size)
+            except ValueError:
+                raise ValidationError('archived_after and archived_limit must be integers.')
+            archived = ArchivedStudent.objects.filter(student_pk__gt=min(after, MAX_ID)).order_by('student_pk')
+            archived = list(archived[:limit + 1])
+            if len(archived) > limit:
+                archived = archived[:limit]
+                next_url = replace_query_param(request.build_absolute_uri(), 'archived_after', archived[-1].student_pk)
+                response['Link'] = f'<{next_url}>; rel="next"'
+            response.data = [*response.data, *ArchivedStudentSerializer(archived, many=True).data]
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            if not self.include_archived():
+                raise
+        # 已封存學生的 id 沿用原本的 student_pk
+        archived = get_object_or_404(ArchivedStudent, student_pk=kwargs[self.lookup_url_kwarg or self.lookup_field])
+        return Response(ArchivedStudentSerializer(archived).data)
 
     def create(self, request, *args, **kwargs):
         is_many = isinstance(request.data, list)
+        if is_bulk(request.data):
+            return accept_job(request, JobKind.STUDENT_CREATE, request.data)
         
         serializer = self.get_serializer(data=request.data, many=is_many)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
 
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+class JobViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    背景批次工作：POST {"kind": "student.create", "rows": [...]} 立即回傳 202
+    GET /api/jobs/{id} 查詢進度與每一列的結果
+    """
+    queryset = Job.objects.order_by('-created_at')
+    serializer_class = JobSerializer
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return JobDetailSerializer
+        if self.action == 'create':
+            return JobCreateSerializer
+        return JobSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('results')
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return accept_job(request, serializer.validated_data['kind'], serializer.validated_data['rows'])
+
+class BatchViewSet(viewsets.ViewSet):
+    """
+    在一個 HTTP 請求中執行多個 API 子請求
+    POST /api/batch {"requests": [{"method": "GET", "path": "/api/students/1"}, ...]}
+    回傳每個子請求的 status、headers 與 body
+    """
+
+    def create(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(run_batch(request, serializer.validated_data['requests']))
+
+# 主鍵是 BigAutoField，超出 64 位元整數的 id 不可能存在，資料庫也無法綁定
+MAX_ID = 2 ** 63 - 1
+
+def parse_ids(value, name):
+    if not value:
+        return []
+    try:
+        ids = [int(pk) for pk in value.split(',') if pk.strip()]
+    except ValueError:
+        raise ValidationError({name: 'Expected a comma separated list of integers.'})
+    if any(not 1 <= pk <= MAX_ID for pk in ids):
+        raise ValidationError({name: f'Ids must be between 1 and {MAX_ID}.'})
+    return ids
+
+class GraphViewSet(viewsets.ViewSet):
+    """
+    導師/指導老師關係圖，以固定次數的查詢一次取回
+    GET /api/graph?teacher_ids=1,2&student_ids=3&department_id=CS
+    """
+
+    def list(self, request):
+        teacher_ids = parse_ids(request.query_params.get('teacher_ids'), 'teacher_ids')
+        student_ids = parse_ids(request.query_params.get('student_ids'), 'student_ids')
+        department_id = request.query_params.get('department_id') or None
+        if not (teacher_ids or student_ids or department_id):
+            raise ValidationError('Provide teacher_ids, student_ids or department_id.')
+        return Response(build_graph(teacher_ids, student_ids, department_id))
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    姓名模糊搜尋與學號/教職員編號前綴搜尋
+    GET /api/search?q=<關鍵字>&kind=student|teacher&limit=20
+    """
+    max_limit = 100
+
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        kind = request.query_params.get('kind') or None
+        if kind is not None and kind not in KINDS:
+            raise ValidationError({'kind': f'Must be one of {", ".join(KINDS)}.'})
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.max_limit)
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        return Response(search_people(query, kind=kind, limit=max(limit, 1)))